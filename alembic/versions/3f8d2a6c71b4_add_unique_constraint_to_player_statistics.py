@@ -0,0 +1,38 @@
+"""Add unique constraint to player statistics
+
+Revision ID: 3f8d2a6c71b4
+Revises: e7a3b5c19d08
+Create Date: 2026-10-15 14:02:51.184327
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f8d2a6c71b4'
+down_revision: Union[str, None] = 'e7a3b5c19d08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Drop duplicates left by earlier ingestion runs, keeping the newest row
+    op.execute("""
+        DELETE FROM player_statistics a USING player_statistics b
+        WHERE a.player_id = b.player_id
+          AND a.team_id = b.team_id
+          AND a.league_id = b.league_id
+          AND a.season_year = b.season_year
+          AND a.id < b.id
+    """)
+    op.create_unique_constraint(
+        'uix_player_team_league_season', 'player_statistics',
+        ['player_id', 'team_id', 'league_id', 'season_year']
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uix_player_team_league_season', 'player_statistics', type_='unique')
@@ -0,0 +1,49 @@
+"""Add unique constraints to odds tree
+
+Revision ID: 5d2f8e1c9a47
+Revises: c46aa7540efa
+Create Date: 2026-10-15 10:12:43.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2f8e1c9a47'
+down_revision: Union[str, None] = 'c46aa7540efa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Drop duplicates left by earlier ingestion runs, keeping the newest row
+    op.execute("""
+        DELETE FROM fixture_bookmakers a USING fixture_bookmakers b
+        WHERE a.fixture_odds_id = b.fixture_odds_id
+          AND a.bookmaker_id = b.bookmaker_id
+          AND a.id < b.id
+    """)
+    op.execute("""
+        DELETE FROM bets a USING bets b
+        WHERE a.fixture_bookmaker_id = b.fixture_bookmaker_id
+          AND a.bet_type_id = b.bet_type_id
+          AND a.id < b.id
+    """)
+    op.execute("""
+        DELETE FROM odd_values a USING odd_values b
+        WHERE a.bet_id = b.bet_id
+          AND a.value = b.value
+          AND a.id < b.id
+    """)
+    op.create_unique_constraint('uix_fixture_odds_bookmaker', 'fixture_bookmakers', ['fixture_odds_id', 'bookmaker_id'])
+    op.create_unique_constraint('uix_fixture_bookmaker_bet_type', 'bets', ['fixture_bookmaker_id', 'bet_type_id'])
+    op.create_unique_constraint('uix_bet_value', 'odd_values', ['bet_id', 'value'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uix_bet_value', 'odd_values', type_='unique')
+    op.drop_constraint('uix_fixture_bookmaker_bet_type', 'bets', type_='unique')
+    op.drop_constraint('uix_fixture_odds_bookmaker', 'fixture_bookmakers', type_='unique')
@@ -0,0 +1,30 @@
+"""Add content_hash to fixture data
+
+Revision ID: 9b41c7d3e2f6
+Revises: 5d2f8e1c9a47
+Create Date: 2026-10-15 11:03:27.842115
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b41c7d3e2f6'
+down_revision: Union[str, None] = '5d2f8e1c9a47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('predictions', sa.Column('content_hash', sa.LargeBinary(), nullable=True))
+    op.add_column('match_statistics', sa.Column('content_hash', sa.LargeBinary(), nullable=True))
+    op.add_column('match_events', sa.Column('content_hash', sa.LargeBinary(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('match_events', 'content_hash')
+    op.drop_column('match_statistics', 'content_hash')
+    op.drop_column('predictions', 'content_hash')
@@ -0,0 +1,31 @@
+"""Add fixture day index
+
+Revision ID: a4c9e2f7b318
+Revises: 3f8d2a6c71b4
+Create Date: 2026-10-15 16:41:07.502913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4c9e2f7b318'
+down_revision: Union[str, None] = '3f8d2a6c71b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # date::date depends on the session time zone and can't be indexed, so the
+    # fixture's UTC day is indexed and get_fixtures filters on the same expression
+    op.create_index(
+        'ix_fixture_league_season_day', 'fixtures',
+        ['league_id', 'season_year', sa.text("((date AT TIME ZONE 'UTC')::date)")]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_fixture_league_season_day', table_name='fixtures')
@@ -0,0 +1,32 @@
+"""Add ingested_at columns to fixtures
+
+Revision ID: e7a3b5c19d08
+Revises: 9b41c7d3e2f6
+Create Date: 2026-10-15 12:21:09.377650
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a3b5c19d08'
+down_revision: Union[str, None] = '9b41c7d3e2f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('fixtures', sa.Column('predictions_ingested_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('fixtures', sa.Column('odds_ingested_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('fixtures', sa.Column('statistics_ingested_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('fixtures', sa.Column('events_ingested_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('fixtures', 'events_ingested_at')
+    op.drop_column('fixtures', 'statistics_ingested_at')
+    op.drop_column('fixtures', 'odds_ingested_at')
+    op.drop_column('fixtures', 'predictions_ingested_at')
@@ -0,0 +1,64 @@
+# app/cache.py
+
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Hashable, NamedTuple, Optional, Union
+
+
+class CacheEntry(NamedTuple):
+    body: Any
+    generated_at: datetime
+    expires_at: Optional[float]
+
+
+class TTLCache:
+    # In-process cache with a TTL per entry; ttl=None keeps the entry until evicted
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._entries = {}
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at is not None and entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        return entry
+
+    def set(self, key: Hashable, body: Any, ttl: Optional[float]) -> None:
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        self._entries.pop(key, None)
+        if len(self._entries) >= self.maxsize:
+            # Evict the oldest insertion
+            del self._entries[next(iter(self._entries))]
+        self._entries[key] = CacheEntry(body, datetime.now(timezone.utc), expires_at)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+api_response_cache = TTLCache()
+
+# get_fixtures responses; cleared by ingestion whenever fixtures, teams or odds change
+fixtures_response_cache = TTLCache(maxsize=1024)
+
+
+async def cached_get(
+    cache: TTLCache,
+    key: Hashable,
+    ttl: Union[Optional[float], Callable[[Any], Optional[float]]],
+    fetch: Callable[[], Awaitable[Any]],
+    force: bool = False
+) -> Any:
+    if not force:
+        entry = cache.get(key)
+        if entry is not None:
+            return entry.body
+
+    body = await fetch()
+    # Failed or not-modified fetches come back as None and are not cached
+    if body is not None:
+        # A callable ttl picks the lifetime from the fetched body
+        cache.set(key, body, ttl(body) if callable(ttl) else ttl)
+    return body
@@ -1,9 +1,14 @@
 # app/crud.py
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, text
 from . import models
-from typing import Optional
+from .cache import TTLCache, cached_get
+from typing import Optional, Sequence
+
+# A season's teams only change when teams are ingested, which clears this cache
+SEASON_TEAMS_TTL = 3600
+season_teams_cache = TTLCache(maxsize=256)
 
 async def get_league(db: AsyncSession, league_id: int) -> Optional[models.League]:
     result = await db.execute(select(models.League).filter(models.League.league_id == league_id))
@@ -29,3 +34,56 @@ async def create_season(db: AsyncSession, season: models.Season):
     await db.commit()
     await db.refresh(season)
     return season
+
+async def get_season_teams(db: AsyncSession, league_id: int, season_year: int) -> Sequence:
+    # (team_id, name) rows of the teams associated with the league season
+    async def fetch():
+        result = await db.execute(
+            select(models.Team.team_id, models.Team.name).join(models.TeamLeague).where(
+                models.TeamLeague.league_id == league_id,
+                models.TeamLeague.season_year == season_year
+            )
+        )
+        return result.all()
+
+    return await cached_get(season_teams_cache, (league_id, season_year), SEASON_TEAMS_TTL, fetch)
+
+async def copy_records(db: AsyncSession, table_name: str, columns: Sequence[str], records: Sequence[tuple]) -> None:
+    # COPY through the session's own asyncpg connection so it joins the open transaction
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        table_name,
+        records=records,
+        columns=list(columns)
+    )
+
+async def copy_upsert_records(
+    db: AsyncSession,
+    table_name: str,
+    columns: Sequence[str],
+    records: Sequence[tuple],
+    conflict_columns: Sequence[str],
+    update_columns: Sequence[str]
+) -> None:
+    # COPY can't resolve conflicts, so load a temp staging table and upsert from it
+    staging_table = f"{table_name}_staging"
+    column_list = ", ".join(columns)
+    await db.execute(text(
+        f"CREATE TEMP TABLE IF NOT EXISTS {staging_table} ON COMMIT DROP AS "
+        f"SELECT {column_list} FROM {table_name} WITH NO DATA"
+    ))
+    await copy_records(db, staging_table, columns, records)
+    if update_columns:
+        update_list = ", ".join(f"{column} = EXCLUDED.{column}" for column in update_columns)
+        # Rows whose values didn't change are left alone rather than rewritten
+        changed = " OR ".join(f"{table_name}.{column} IS DISTINCT FROM EXCLUDED.{column}" for column in update_columns)
+        on_conflict = f"DO UPDATE SET {update_list} WHERE {changed}"
+    else:
+        # Nothing to update: existing rows are kept as they are
+        on_conflict = "DO NOTHING"
+    await db.execute(text(
+        f"INSERT INTO {table_name} ({column_list}) SELECT {column_list} FROM {staging_table} "
+        f"ON CONFLICT ({', '.join(conflict_columns)}) {on_conflict}"
+    ))
+    await db.execute(text(f"TRUNCATE {staging_table}"))
@@ -4,6 +4,7 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
+from uuid import uuid4
 from dotenv import load_dotenv
 
 load_dotenv()  # Load environment variables from .env file
@@ -13,7 +14,47 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if DATABASE_URL.startswith("postgresql://"):
     DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+# Ingestion runs the same handful of statements for every fixture/team, so keep
+# both SQLAlchemy's compiled-SQL cache and asyncpg's prepared statements warm.
+QUERY_CACHE_SIZE = 1200
+PREPARED_STATEMENT_CACHE_SIZE = 512
+
+# Ingestion and retrieval share one pool; size it for concurrent fetch/store
+# work and drop connections that the server or a proxy may have closed.
+# Most connections stay pooled so bursts rarely open new ones.
+POOL_SIZE = 20
+MAX_OVERFLOW = 10
+POOL_TIMEOUT = 30
+POOL_RECYCLE = 1800
+COMMAND_TIMEOUT = 60
+
+# Set DATABASE_PGBOUNCER when DATABASE_URL points at PgBouncer in transaction
+# pooling mode. Consecutive statements may run on different server
+# connections there, so named prepared statements can't be cached or reused.
+USE_PGBOUNCER = os.getenv("DATABASE_PGBOUNCER", "").lower() in ("1", "true", "yes")
+
+connect_args = {
+    "prepared_statement_cache_size": PREPARED_STATEMENT_CACHE_SIZE,
+    "command_timeout": COMMAND_TIMEOUT,
+}
+if USE_PGBOUNCER:
+    connect_args.update(
+        prepared_statement_cache_size=0,
+        statement_cache_size=0,
+        prepared_statement_name_func=lambda: f"__asyncpg_{uuid4()}__",
+    )
+
+engine = create_async_engine(
+    DATABASE_URL,
+    echo=True,
+    query_cache_size=QUERY_CACHE_SIZE,
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
+    pool_timeout=POOL_TIMEOUT,
+    pool_recycle=POOL_RECYCLE,
+    pool_pre_ping=True,
+    connect_args=connect_args,
+)
 
 SessionLocal = sessionmaker(
     bind=engine,
@@ -0,0 +1,96 @@
+# app/http_clients.py
+
+import asyncio
+import logging
+import os
+import random
+import httpx
+import orjson
+from fastapi import Request
+
+from app.rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+API_FOOTBALL_KEY = os.getenv("API_FOOTBALL_KEY")
+
+API_FOOTBALL_BASE_URL = "https://v3.football.api-sports.io"
+
+# Statuses worth retrying; api-sports also reports quota errors in a 200 body
+RETRY_STATUSES = (429, 502, 503, 504)
+RETRY_ATTEMPTS = 4
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 60
+
+# Requests per minute allowed by the plan; corrected from X-RateLimit-Limit
+API_FOOTBALL_REQUESTS_PER_MINUTE = int(os.getenv("API_FOOTBALL_REQUESTS_PER_MINUTE", "300"))
+api_rate_limiter = RateLimiter(API_FOOTBALL_REQUESTS_PER_MINUTE, time_period=60)
+
+API_FOOTBALL_HEADERS = {
+    'x-apisports-key': API_FOOTBALL_KEY,
+    'Accept': 'application/json',
+    # httpx decodes gzip itself; br is left out as brotli isn't a dependency
+    'Accept-Encoding': 'gzip'
+}
+
+def create_api_football_client() -> httpx.AsyncClient:
+    # HTTP/2 lets concurrent requests share one TLS connection to the API host
+    # Leave out a missing key so the app still starts; ingesters report it per request
+    headers = {name: value for name, value in API_FOOTBALL_HEADERS.items() if value is not None}
+    return httpx.AsyncClient(
+        http2=True,
+        headers=headers,
+        timeout=httpx.Timeout(15.0),
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+    )
+
+def get_api_client(request: Request) -> httpx.AsyncClient:
+    return request.app.state.api_football_client
+
+def parse_response(response: httpx.Response):
+    # orjson decodes the raw bytes directly; its JSONDecodeError is a ValueError
+    return orjson.loads(response.content)
+
+def is_rate_limited(response: httpx.Response) -> bool:
+    if response.status_code in RETRY_STATUSES:
+        return True
+    return response.status_code == 200 and b'"rateLimit"' in response.content
+
+def retry_delay(response: httpx.Response, attempt: int, base: float) -> float:
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), RETRY_MAX_DELAY)
+    # Jitter keeps concurrent workers that failed together from retrying in lockstep
+    return min(base * 2 ** attempt + random.uniform(0, base), RETRY_MAX_DELAY)
+
+async def api_get(
+    client: httpx.AsyncClient,
+    url: str,
+    params: dict = None,
+    headers: dict = None,
+    attempts: int = RETRY_ATTEMPTS,
+    base: float = RETRY_BASE_DELAY
+) -> httpx.Response:
+    # Retries transient failures with exponential backoff. The last response
+    # is returned even if still failing; transport errors are re-raised.
+    for attempt in range(attempts):
+        response = None
+        try:
+            async with api_rate_limiter:
+                response = await client.get(url, params=params, headers=headers)
+        except httpx.TransportError as e:
+            if attempt == attempts - 1:
+                raise
+            logger.warning(f"Request to {url} failed ({e}), retrying.")
+        else:
+            rate_limit = response.headers.get("X-RateLimit-Limit")
+            if rate_limit and rate_limit.isdigit():
+                api_rate_limiter.set_rate(int(rate_limit))
+            remaining = response.headers.get("X-RateLimit-Remaining")
+            if remaining and remaining.isdigit():
+                api_rate_limiter.set_remaining(int(remaining))
+            if not is_rate_limited(response) or attempt == attempts - 1:
+                return response
+            logger.warning(f"Request to {url} returned {response.status_code} (rate limited or unavailable), retrying.")
+
+        await asyncio.sleep(retry_delay(response, attempt, base))
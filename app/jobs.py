@@ -0,0 +1,82 @@
+# app/jobs.py
+
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone
+
+from fastapi import Request
+
+logger = logging.getLogger(__name__)
+
+# Ingestion jobs hit the same API quota and tables, so run them one at a time
+JOB_WORKERS = 1
+# Finished jobs kept around for status lookups
+JOB_HISTORY_SIZE = 100
+
+
+class JobQueue:
+    def __init__(self, workers: int = JOB_WORKERS):
+        self.workers = workers
+        self.queue = asyncio.Queue()
+        self.jobs = {}
+        self._tasks = []
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def enqueue(self, name, func, *args, **kwargs) -> dict:
+        job = {
+            "id": uuid.uuid4().hex,
+            "name": name,
+            "status": "queued",
+            "enqueued_at": datetime.now(timezone.utc),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        self.jobs[job["id"]] = job
+        self._prune()
+        await self.queue.put((job["id"], func, args, kwargs))
+        logger.info(f"Queued job {job['id']} ({name}).")
+        return job
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job["finished_at"] is not None]
+        for job_id in finished[:max(0, len(finished) - JOB_HISTORY_SIZE)]:
+            del self.jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            job_id, func, args, kwargs = await self.queue.get()
+            job = self.jobs[job_id]
+            job["status"] = "running"
+            job["started_at"] = datetime.now(timezone.utc)
+            try:
+                job["result"] = await func(*args, **kwargs)
+                job["status"] = "finished"
+            except asyncio.CancelledError:
+                job["status"] = "cancelled"
+                raise
+            except Exception as e:
+                # HTTPExceptions raised by the ingestion code carry their message in detail
+                job["error"] = getattr(e, "detail", None) or str(e)
+                job["status"] = "failed"
+                logger.error(f"Job {job_id} ({job['name']}) failed: {job['error']}", exc_info=True)
+            finally:
+                job["finished_at"] = datetime.now(timezone.utc)
+                self.queue.task_done()
+
+
+def get_job_queue(request: Request) -> JobQueue:
+    return request.app.state.job_queue
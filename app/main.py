@@ -1,9 +1,12 @@
 # app/main.py
 
+import logging
 from fastapi import FastAPI
 from .database import engine, Base
+from .http_clients import create_api_football_client
+from .jobs import JobQueue
 from fastapi.middleware.cors import CORSMiddleware
-from .routers.ingestion import ingest_leagues, ingest_teams, ingest_players, ingest_player_statistics, ingest_fixtures, ingest_odds, ingest_predictions, ingest_fixtures_data
+from .routers.ingestion import ingest_leagues, ingest_teams, ingest_players, ingest_player_statistics, ingest_fixtures, ingest_odds, ingest_predictions, ingest_fixtures_data, ingest_jobs
 from .routers.retrieval import (
     leagues,
     teams,
@@ -18,13 +21,23 @@ from .routers.retrieval import (
 )
 from contextlib import asynccontextmanager
 
+# Logging is configured once for the app rather than in each router module
+logging.basicConfig(level=logging.INFO)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup code: create tables
     # async with engine.begin() as conn:
     #     await conn.run_sync(Base.metadata.create_all)
+    # One pooled API-Football client for the lifetime of the app
+    app.state.api_football_client = create_api_football_client()
+    # Background queue for long-running ingestion jobs
+    app.state.job_queue = JobQueue()
+    app.state.job_queue.start()
     yield
-    # Shutdown code: dispose engine
+    # Shutdown code: stop queued jobs, close the API client and dispose engine
+    await app.state.job_queue.stop()
+    await app.state.api_football_client.aclose()
     await engine.dispose()
 
 
@@ -48,6 +61,7 @@ app.include_router(ingest_fixtures.router)
 app.include_router(ingest_odds.router)
 app.include_router(ingest_predictions.router)
 app.include_router(ingest_fixtures_data.router)
+app.include_router(ingest_jobs.router)
 
 
 
@@ -12,6 +12,7 @@ from sqlalchemy import (
     Float,
     UniqueConstraint,
     ForeignKeyConstraint,
+    LargeBinary,
 )
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -128,6 +129,9 @@ class Player(Base):
 
 class PlayerStatistics(Base):
     __tablename__ = "player_statistics"
+    __table_args__ = (
+        UniqueConstraint('player_id', 'team_id', 'league_id', 'season_year', name='uix_player_team_league_season'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     player_id = Column(Integer, ForeignKey("players.player_id"), nullable=False)
@@ -225,6 +229,12 @@ class Fixture(Base):
     status_extra = Column(String, nullable=True)
     is_final = Column(Boolean, default=False)
 
+    # When each fixture data endpoint was last fetched and stored
+    predictions_ingested_at = Column(DateTime(timezone=True), nullable=True)
+    odds_ingested_at = Column(DateTime(timezone=True), nullable=True)
+    statistics_ingested_at = Column(DateTime(timezone=True), nullable=True)
+    events_ingested_at = Column(DateTime(timezone=True), nullable=True)
+
     league_id = Column(Integer, ForeignKey("leagues.league_id"), nullable=False)
 
     season_year = Column(Integer, nullable=False)
@@ -303,6 +313,9 @@ class FixtureOdds(Base):
 
 class FixtureBookmaker(Base):
     __tablename__ = "fixture_bookmakers"
+    __table_args__ = (
+        UniqueConstraint('fixture_odds_id', 'bookmaker_id', name='uix_fixture_odds_bookmaker'),
+    )
 
     id = Column(Integer, primary_key=True)
     fixture_odds_id = Column(
@@ -323,6 +336,9 @@ class FixtureBookmaker(Base):
 
 class Bet(Base):
     __tablename__ = "bets"
+    __table_args__ = (
+        UniqueConstraint('fixture_bookmaker_id', 'bet_type_id', name='uix_fixture_bookmaker_bet_type'),
+    )
 
     id = Column(Integer, primary_key=True)
     fixture_bookmaker_id = Column(
@@ -341,6 +357,9 @@ class Bet(Base):
 
 class OddValue(Base):
     __tablename__ = "odd_values"
+    __table_args__ = (
+        UniqueConstraint('bet_id', 'value', name='uix_bet_value'),
+    )
 
     id = Column(Integer, primary_key=True)
     bet_id = Column(Integer, ForeignKey("bets.id", ondelete="CASCADE"), nullable=False)
@@ -373,6 +392,7 @@ class Prediction(Base):
     percent_draw = Column(String)
     percent_away = Column(String)
     comparison = Column(JSON)
+    content_hash = Column(LargeBinary)
 
     fixture = relationship("Fixture", back_populates="prediction")
     winner_team = relationship("Team")
@@ -388,6 +408,7 @@ class MatchStatistics(Base):
     fixture_id = Column(Integer, ForeignKey('fixtures.fixture_id', ondelete="CASCADE"), nullable=False)
     team_id = Column(Integer, ForeignKey('teams.team_id'), nullable=False)
     statistics = Column(JSON)
+    content_hash = Column(LargeBinary)
 
     # Relationships
     fixture = relationship('Fixture', back_populates='match_statistics')
@@ -406,6 +427,7 @@ class MatchEvent(Base):
     type = Column(String)  # e.g., 'Goal', 'Card', 'Substitution', etc.
     detail = Column(String)  # e.g., 'Normal Goal', 'Yellow Card', etc.
     comments = Column(String, nullable=True)
+    content_hash = Column(LargeBinary)
 
     fixture = relationship('Fixture', back_populates='match_events')
     team = relationship('Team')
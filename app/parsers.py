@@ -0,0 +1,17 @@
+# app/parsers.py
+
+from datetime import date, datetime, timezone
+from functools import lru_cache
+
+
+@lru_cache(maxsize=4096)
+def parse_api_datetime(value: str) -> datetime:
+    # API-Football timestamps are ISO 8601 with a "Z" or numeric offset; many
+    # odds entries share the same update time, so results are memoized
+    if value.endswith('Z'):
+        return datetime.fromisoformat(value[:-1]).replace(tzinfo=timezone.utc)
+    return datetime.fromisoformat(value)
+
+
+def parse_api_date(value: str) -> date:
+    return date.fromisoformat(value)
@@ -0,0 +1,46 @@
+# app/rate_limiter.py
+
+import asyncio
+import time
+
+
+class RateLimiter:
+    # Token bucket allowing max_rate acquisitions per time_period seconds
+    def __init__(self, max_rate: float, time_period: float = 60):
+        self.max_rate = max_rate
+        self.time_period = time_period
+        self._tokens = float(max_rate)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def set_rate(self, max_rate: float) -> None:
+        if max_rate > 0 and max_rate != self.max_rate:
+            self._refill()
+            self.max_rate = max_rate
+            self._tokens = min(self._tokens, float(max_rate))
+
+    def set_remaining(self, remaining: int) -> None:
+        # The server's count wins when it is lower, e.g. other clients share the quota
+        self._refill()
+        self._tokens = min(self._tokens, float(max(remaining, 0)))
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(float(self.max_rate), self._tokens + elapsed * self.max_rate / self.time_period)
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) * self.time_period / self.max_rate)
+                self._refill()
+            self._tokens -= 1
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
@@ -1,16 +1,25 @@
 # app/routers/ingestion/ingest_fixtures_data.py
 
+import asyncio
+import functools
+import hashlib
 import logging
 import os
 from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, insert, update, and_, or_, func, lambda_stmt, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError
 import httpx
+import orjson
 
-from app.database import get_db
-from app import models
+from app.cache import api_response_cache, cached_get, fixtures_response_cache
+from app.database import SessionLocal
+from app.jobs import JobQueue, get_job_queue
+from app.parsers import parse_api_datetime
+from app.http_clients import API_FOOTBALL_BASE_URL, api_get, get_api_client, parse_response
+from app import crud, models
 
 router = APIRouter(
     prefix="/ingest",
@@ -19,17 +28,114 @@ router = APIRouter(
 
 API_FOOTBALL_KEY = os.getenv("API_FOOTBALL_KEY")
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@router.post("/fixtures_data/", response_model=dict)
-async def fetch_and_store_fixtures_data(db: AsyncSession = Depends(get_db)):
-    logger.info("Starting the fixtures data ingestion process.")
+FINAL_STATUSES = ('FT', 'AET', 'PEN', 'AWD', 'WO')
+
+FIXTURE_ENDPOINTS = {
+    'predictions': "predictions",
+    'odds': "odds",
+    'statistics': "fixtures/statistics",
+    'events': "fixtures/events",
+}
+
+# Network fetches and DB writes are pipelined: FETCH_WORKERS producers pull
+# fixtures and call the API while a single consumer owns the session. Each
+# producer requests a fixture's endpoints concurrently, so up to
+# FETCH_WORKERS * len(FIXTURE_ENDPOINTS) requests can be in flight.
+FETCH_WORKERS = 8
+FETCHED_QUEUE_SIZE = 32
+FIXTURE_ROWS_PER_FETCH = 500
+
+# Above this many odd values per fixture, use COPY instead of a multi-row INSERT
+ODD_VALUES_COPY_THRESHOLD = 200
+ODD_VALUE_COLUMNS = ('bet_id', 'value', 'odd')
+
+# Fixture data stored more recently than this is not fetched again
+FIXTURE_DATA_REFRESH_INTERVAL = timedelta(minutes=15)
+
+# Returned instead of a payload when the API says the data hasn't changed (a 304,
+# or odds not updated since the stored ones). Unlike None, which means the fetch
+# failed and is retried, it still marks the endpoint as checked.
+UNCHANGED = object()
+
+# Responses for finished fixtures rarely change; live ones are only reused briefly.
+# Empty and unchanged responses say nothing lasting, so they get the live TTL.
+LIVE_RESPONSE_TTL = 30
+FINAL_RESPONSE_TTL = 6 * 60 * 60
+
+
+def final_response_ttl(body):
+    if not body or body is UNCHANGED:
+        return LIVE_RESPONSE_TTL
+    return FINAL_RESPONSE_TTL
+
+# Statements that take only executemany parameters are built once at import,
+# so every fixture reuses the same objects and SQLAlchemy's compiled cache entry.
+# The upserts return their conflict key with the id: batched RETURNING rows
+# aren't in parameter order once existing rows are updated, so ids are matched
+# to their rows by key rather than by position.
+_fixture_bookmaker_insert = pg_insert(models.FixtureBookmaker)
+FIXTURE_BOOKMAKER_UPSERT = _fixture_bookmaker_insert.on_conflict_do_update(
+    constraint='uix_fixture_odds_bookmaker',
+    set_={'bookmaker_id': _fixture_bookmaker_insert.excluded.bookmaker_id}
+).returning(models.FixtureBookmaker.id, models.FixtureBookmaker.bookmaker_id)
+
+_bet_insert = pg_insert(models.Bet)
+BET_UPSERT = _bet_insert.on_conflict_do_update(
+    constraint='uix_fixture_bookmaker_bet_type',
+    set_={'bet_type_id': _bet_insert.excluded.bet_type_id}
+).returning(models.Bet.id, models.Bet.fixture_bookmaker_id, models.Bet.bet_type_id)
+
+_odd_value_insert = pg_insert(models.OddValue)
+ODD_VALUE_UPSERT = _odd_value_insert.on_conflict_do_update(
+    constraint='uix_bet_value',
+    set_={'odd': _odd_value_insert.excluded.odd},
+    where=models.OddValue.odd.is_distinct_from(_odd_value_insert.excluded.odd)
+)
+
+_prediction_insert = pg_insert(models.Prediction)
+PREDICTION_UPSERT = _prediction_insert.on_conflict_do_update(
+    constraint='predictions_fixture_id_key',
+    set_={
+        column: _prediction_insert.excluded[column]
+        for column in (
+            'winner_team_id', 'win_or_draw', 'under_over', 'goals_home', 'goals_away', 'advice',
+            'percent_home', 'percent_draw', 'percent_away', 'comparison', 'content_hash',
+        )
+    },
+    where=models.Prediction.content_hash.is_distinct_from(_prediction_insert.excluded.content_hash)
+)
 
+BOOKMAKER_INSERT = pg_insert(models.Bookmaker).on_conflict_do_nothing()
+BET_TYPE_INSERT = pg_insert(models.BetType).on_conflict_do_nothing()
+MATCH_STATISTICS_INSERT = insert(models.MatchStatistics)
+MATCH_EVENT_INSERT = insert(models.MatchEvent)
+
+@router.post("/fixtures_data/", response_model=dict)
+async def fetch_and_store_fixtures_data(
+    force: bool = False,
+    client: httpx.AsyncClient = Depends(get_api_client),
+    jobs: JobQueue = Depends(get_job_queue)
+):
     if not API_FOOTBALL_KEY:
         logger.error("API_FOOTBALL_KEY environment variable is not set.")
         raise HTTPException(status_code=500, detail="API key not configured.")
 
+    # The ingestion takes minutes, so run it in the background and let the
+    # caller poll GET /ingest/jobs/{job_id}
+    job = await jobs.enqueue("fixtures_data", run_fixtures_data_ingestion, client, force)
+    return {"message": "Fixtures data ingestion queued", "job_id": job["id"]}
+
+
+async def run_fixtures_data_ingestion(client, force=False):
+    async with SessionLocal() as db:
+        return await ingest_fixtures_data(db, client, force)
+
+
+async def ingest_fixtures_data(db, client, force=False):
+    logger.info("Starting the fixtures data ingestion process.")
+
     league_id = 2  
 
     # Fetch the current season for this league
@@ -52,65 +158,370 @@ async def fetch_and_store_fixtures_data(db: AsyncSession = Depends(get_db)):
     start_date = datetime.combine(current_season.start_date, datetime.min.time()).replace(tzinfo=timezone.utc)
     end_date = datetime.combine(current_season.end_date, datetime.min.time()).replace(tzinfo=timezone.utc)
 
-    headers = {
-        'x-apisports-key': API_FOOTBALL_KEY,
-        'Accept': 'application/json'
-    }
+    # A forced run treats everything as stale
+    refreshed_before = datetime.now(timezone.utc)
+    if not force:
+        refreshed_before -= FIXTURE_DATA_REFRESH_INTERVAL
 
     try:
-        async with httpx.AsyncClient() as client:
-            fixtures_result = await db.execute(
-                select(models.Fixture.fixture_id, models.Fixture.status_short).filter(
-                    models.Fixture.date >= start_date,
-                    models.Fixture.date <= end_date
+        # Work out in one query which endpoints each fixture still needs:
+        # live fixtures whose data is stale, and finished fixtures with data
+        # that is missing and hasn't just been checked.
+        stored_statistics = select(models.MatchStatistics.fixture_id).distinct().subquery()
+        stored_events = select(models.MatchEvent.fixture_id).distinct().subquery()
+        has_prediction = models.Prediction.id.is_not(None)
+        has_odds = models.FixtureOdds.id.is_not(None)
+        has_statistics = stored_statistics.c.fixture_id.is_not(None)
+        has_events = stored_events.c.fixture_id.is_not(None)
+        predictions_stale = stale_filter(models.Fixture.predictions_ingested_at, refreshed_before)
+        odds_stale = stale_filter(models.Fixture.odds_ingested_at, refreshed_before)
+        statistics_stale = stale_filter(models.Fixture.statistics_ingested_at, refreshed_before)
+        events_stale = stale_filter(models.Fixture.events_ingested_at, refreshed_before)
+
+        fixtures_query = (
+            select(
+                models.Fixture.fixture_id,
+                models.Fixture.status_short,
+                models.Fixture.date,
+                models.Fixture.league_id,
+                models.Fixture.season_year,
+                has_prediction.label('has_prediction'),
+                has_odds.label('has_odds'),
+                models.FixtureOdds.update_time.label('odds_update_time'),
+                has_statistics.label('has_statistics'),
+                has_events.label('has_events'),
+                models.Fixture.predictions_ingested_at,
+                models.Fixture.odds_ingested_at,
+                models.Fixture.statistics_ingested_at,
+                models.Fixture.events_ingested_at,
+            )
+            .outerjoin(models.Prediction, models.Prediction.fixture_id == models.Fixture.fixture_id)
+            .outerjoin(models.FixtureOdds, models.FixtureOdds.fixture_id == models.Fixture.fixture_id)
+            .outerjoin(stored_statistics, stored_statistics.c.fixture_id == models.Fixture.fixture_id)
+            .outerjoin(stored_events, stored_events.c.fixture_id == models.Fixture.fixture_id)
+            .filter(
+                models.Fixture.date >= start_date,
+                models.Fixture.date <= end_date,
+                or_(
+                    and_(
+                        models.Fixture.status_short.not_in(FINAL_STATUSES),
+                        or_(predictions_stale, odds_stale)
+                    ),
+                    and_(~has_prediction, predictions_stale),
+                    and_(~has_odds, odds_stale),
+                    and_(~has_statistics, statistics_stale),
+                    and_(~has_events, events_stale)
                 )
             )
-            fixture_rows = fixtures_result.fetchall()
+        )
 
-            if not fixture_rows:
-                logger.info("No fixtures found within the specified date range.")
-                return {"message": "No fixtures found within the specified date range."}
+        pending = asyncio.Queue(maxsize=FETCHED_QUEUE_SIZE)
+        fetched = asyncio.Queue(maxsize=FETCHED_QUEUE_SIZE)
 
-            data_processed = 0
+        # Odds are fetched per league and match day, shared by all workers
+        league_odds = {}
 
-            for fixture_id, status_short in fixture_rows:
-                logger.info(f"Processing fixture ID: {fixture_id}")
+        known_ids = await load_odds_reference_ids(db)
 
-                await fetch_and_store_prediction_for_fixture(fixture_id, client, db, headers)
-                await fetch_and_store_odds_for_fixture(fixture_id, client, db, headers)
+        feeder = asyncio.create_task(feed_fixture_rows(fixtures_query, pending))
+        producers = [
+            asyncio.create_task(
+                fetch_fixture_data_worker(pending, fetched, client, refreshed_before, league_odds, force)
+            )
+            for _ in range(FETCH_WORKERS)
+        ]
+        producing = asyncio.create_task(finish_producing(fetched, feeder, *producers))
+        consumer = asyncio.create_task(store_fixture_data_worker(fetched, db, known_ids))
 
-                if status_short in ['FT', 'AET', 'PEN', 'AWD', 'WO']:
-                    await fetch_and_store_match_statistics(fixture_id, client, db, headers)
-                    await fetch_and_store_match_events(fixture_id, client, db, headers)
+        try:
+            (fixtures_found, *_), data_processed = await run_until_first_error(producing, consumer)
+        finally:
+            for task in (producing, feeder, *producers, consumer, *league_odds.values()):
+                task.cancel()
+            # Once per run rather than per stored fixture; odds committed before a
+            # failure still invalidate the cached responses
+            fixtures_response_cache.clear()
 
-                data_processed += 1
+        if not fixtures_found:
+            logger.info("No fixtures needing data found within the specified date range.")
+            return {"message": "No fixtures needing data found within the specified date range."}
 
-            logger.info(f"Finished fetching and storing data. Total fixtures processed: {data_processed}")
-            return {"message": "Fixtures data fetched and stored successfully", "processed": data_processed}
+        logger.info("Finished fetching and storing data. Total fixtures processed: %s", data_processed)
+        return {"message": "Fixtures data fetched and stored successfully", "processed": data_processed}
 
     except Exception as e:
         await db.rollback()
-        logger.error(f"An unexpected error occurred during fixtures data ingestion: {e}", exc_info=True)
+        logger.error("An unexpected error occurred during fixtures data ingestion: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-async def fetch_and_store_prediction_for_fixture(fixture_id, client, db, headers):
+async def finish_producing(fetched, *producers):
+    # Tells the consumer there is nothing more once every producer is done
+    results = await asyncio.gather(*producers)
+    await fetched.put(None)
+    return results
+
+
+async def run_until_first_error(*tasks):
+    # Waits for all tasks but raises as soon as one fails. A producer left
+    # waiting on a full queue whose consumer died would otherwise hang the
+    # run; the caller cancels whatever is still running.
+    done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    for task in done:
+        if not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+    return [task.result() for task in tasks]
+
+
+async def feed_fixture_rows(fixtures_query, pending):
+    # Stream from a server-side cursor on a separate session: the writer commits
+    # on its own session, which would close a cursor opened there.
+    fixtures_found = 0
+    async with SessionLocal() as read_db:
+        result = await read_db.stream(
+            fixtures_query.execution_options(yield_per=FIXTURE_ROWS_PER_FETCH)
+        )
+        async for fixture_row in result:
+            await pending.put(fixture_row)
+            fixtures_found += 1
+
+    for _ in range(FETCH_WORKERS):
+        await pending.put(None)
+    return fixtures_found
+
+
+async def fetch_fixture_data_worker(pending, fetched, client, refreshed_before, league_odds, force=False):
+    while True:
+        fixture_row = await pending.get()
+        if fixture_row is None:
+            return
+
+        fixture_id = fixture_row.fixture_id
+        logger.info("Fetching data for fixture ID: %s", fixture_id)
+        keys = fixture_endpoints_needed(fixture_row, refreshed_before)
+        ttl = final_response_ttl if fixture_row.status_short in FINAL_STATUSES else LIVE_RESPONSE_TTL
+        requests = []
+        for key in keys:
+            headers = None
+            if key == 'odds' and fixture_row.odds_update_time:
+                last_modified = fixture_row.odds_update_time.astimezone(timezone.utc)
+                headers = {'If-Modified-Since': format_datetime(last_modified, usegmt=True)}
+            if key == 'odds':
+                fetch = functools.partial(fetch_fixture_odds, fixture_row, client, league_odds, headers)
+            else:
+                fetch = functools.partial(fetch_fixture_endpoint, FIXTURE_ENDPOINTS[key], fixture_id, client, headers)
+            requests.append(cached_get(api_response_cache, (key, fixture_id), ttl, fetch, force=force))
+        payload = dict(zip(keys, await asyncio.gather(*requests)))
+
+        # The API may ignore If-Modified-Since, so also compare the payload's own update time
+        odds = payload.get('odds')
+        if odds and odds is not UNCHANGED and fixture_row.odds_update_time:
+            if not odds_updated_since(odds, fixture_row.odds_update_time):
+                logger.info("Odds for fixture %s unchanged since %s.", fixture_id, fixture_row.odds_update_time)
+                payload['odds'] = UNCHANGED
+
+        await fetched.put((fixture_id, payload))
+
+
+def stale_filter(ingested_at_column, refreshed_before):
+    return or_(ingested_at_column.is_(None), ingested_at_column < refreshed_before)
+
+
+def is_stale(ingested_at, refreshed_before):
+    return ingested_at is None or ingested_at < refreshed_before
+
+
+def fixture_endpoints_needed(fixture_row, refreshed_before):
+    # Predictions and odds keep changing until the match is over; statistics
+    # and events only exist afterwards. Once final, fetch only what is missing.
+    # Either way, skip endpoints stored since refreshed_before.
+    if fixture_row.status_short not in FINAL_STATUSES:
+        return [
+            key for key in ('predictions', 'odds')
+            if is_stale(getattr(fixture_row, f"{key}_ingested_at"), refreshed_before)
+        ]
+
+    stored = {
+        'predictions': fixture_row.has_prediction,
+        'odds': fixture_row.has_odds,
+        'statistics': fixture_row.has_statistics,
+        'events': fixture_row.has_events,
+    }
+    return [
+        key for key in FIXTURE_ENDPOINTS
+        if not stored[key] and is_stale(getattr(fixture_row, f"{key}_ingested_at"), refreshed_before)
+    ]
+
+
+async def store_fixture_data_worker(fetched, db, known_ids=None):
+    data_processed = 0
+    while True:
+        item = await fetched.get()
+        if item is None:
+            return data_processed
+
+        fixture_id, payload = item
+        logger.info("Processing fixture ID: %s", fixture_id)
+
+        # Unchanged data has nothing to store but still counts as checked
+        stored = {key: True for key, data in payload.items() if data is UNCHANGED}
+        if has_new_data(payload, 'predictions'):
+            stored['predictions'] = await store_prediction_for_fixture(fixture_id, payload['predictions'], db)
+        if has_new_data(payload, 'odds'):
+            stored['odds'] = await store_odds_for_fixture(fixture_id, payload['odds'], db, known_ids)
+        if has_new_data(payload, 'statistics'):
+            stored['statistics'] = await store_match_statistics(fixture_id, payload['statistics'], db)
+        if has_new_data(payload, 'events'):
+            stored['events'] = await store_match_events(fixture_id, payload['events'], db)
+
+        # An empty response also counts as checked; failed fetches and stores are retried next run
+        ingested = {
+            f"{key}_ingested_at": func.now()
+            for key, ok in stored.items()
+            if ok or not payload[key]
+        }
+        if ingested:
+            await db.execute(
+                update(models.Fixture)
+                .where(models.Fixture.fixture_id == fixture_id)
+                .values(**ingested)
+            )
+            await db.commit()
+
+        data_processed += 1
+
+
+def has_new_data(payload, key):
+    data = payload.get(key)
+    return data is not None and data is not UNCHANGED
+
+
+async def fetch_fixture_endpoint(endpoint, fixture_id, client, headers=None):
     try:
         params = {'fixture': fixture_id}
-        response = await client.get("https://v3.football.api-sports.io/predictions", headers=headers, params=params)
+        response = await api_get(client, f"{API_FOOTBALL_BASE_URL}/{endpoint}", params=params, headers=headers)
+
+        if response.status_code == 304:
+            logger.info("%s for fixture %s not modified.", endpoint, fixture_id)
+            return UNCHANGED
 
         if response.status_code != 200:
-            logger.error(f"Failed to fetch prediction for fixture {fixture_id}: {response.text}")
-            return
+            logger.error("Failed to fetch %s for fixture %s: %s", endpoint, fixture_id, response.text)
+            return None
+
+        data = parse_response(response)
+        if endpoint == FIXTURE_ENDPOINTS['odds']:
+            return compact_odds_response(data.get("response", []))
+        return data.get("response", [])
+
+    except Exception as e:
+        logger.error("Error fetching %s for fixture %s: %s", endpoint, fixture_id, e, exc_info=True)
+        return None
+
+
+async def fetch_fixture_odds(fixture_row, client, league_odds, headers=None):
+    # One bulk request per league and match day serves every fixture played
+    # that day; fall back to the per-fixture endpoint if it fails
+    if fixture_row.date is None:
+        return await fetch_fixture_endpoint(FIXTURE_ENDPOINTS['odds'], fixture_row.fixture_id, client, headers)
 
-        data = response.json()
-        predictions_response = data.get("response", [])
+    match_date = fixture_row.date.astimezone(timezone.utc).date()
+    day_key = (fixture_row.league_id, fixture_row.season_year, match_date)
+    if day_key not in league_odds:
+        league_odds[day_key] = asyncio.create_task(fetch_league_odds_for_date(client, *day_key))
+    odds_by_fixture = await league_odds[day_key]
 
+    if odds_by_fixture is None:
+        return await fetch_fixture_endpoint(FIXTURE_ENDPOINTS['odds'], fixture_row.fixture_id, client, headers)
+    return odds_by_fixture.get(fixture_row.fixture_id, [])
+
+
+async def fetch_league_odds_for_date(client, league_id, season_year, match_date):
+    odds_by_fixture = {}
+    page = 1
+    try:
+        while True:
+            params = {'league': league_id, 'season': season_year, 'date': match_date.isoformat(), 'page': page}
+            response = await api_get(client, f"{API_FOOTBALL_BASE_URL}/{FIXTURE_ENDPOINTS['odds']}", params=params)
+            if response.status_code != 200:
+                logger.error("Failed to fetch odds for league %s on %s: %s", league_id, match_date, response.text)
+                return None
+
+            data = parse_response(response)
+            for odds_data in compact_odds_response(data.get("response", [])):
+                odds_by_fixture.setdefault(odds_data["fixture"]["id"], []).append(odds_data)
+
+            if page >= data.get("paging", {}).get("total", 1):
+                return odds_by_fixture
+            page += 1
+
+    except Exception as e:
+        logger.error("Error fetching odds for league %s on %s: %s", league_id, match_date, e, exc_info=True)
+        return None
+
+
+def compact_odds_response(odds_response):
+    # Odds payloads are large and cached payloads of finished fixtures stay in
+    # memory, so keep only the fields store_odds_for_fixture reads
+    return [
+        {
+            "fixture": {"id": odds_data.get("fixture", {}).get("id")},
+            "update": odds_data.get("update"),
+            "bookmakers": [
+                {
+                    "id": bookmaker_data.get("id"),
+                    "name": bookmaker_data.get("name"),
+                    "bets": [
+                        {
+                            "id": bet_data.get("id"),
+                            "name": bet_data.get("name"),
+                            "values": [
+                                {"value": value_data.get("value"), "odd": value_data.get("odd")}
+                                for value_data in bet_data.get("values", [])
+                            ],
+                        }
+                        for bet_data in bookmaker_data.get("bets", [])
+                    ],
+                }
+                for bookmaker_data in odds_data.get("bookmakers", [])
+            ],
+        }
+        for odds_data in odds_response
+    ]
+
+
+def odds_updated_since(odds_response, last_update_time):
+    for odds_data in odds_response:
+        update_time_str = odds_data.get("update")
+        if not update_time_str:
+            return True
+        if parse_api_datetime(update_time_str) > last_update_time:
+            return True
+    return False
+
+
+def payload_hash(payload):
+    # Stable digest of an API payload, stored alongside the rows built from it
+    canonical = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+    return hashlib.blake2b(canonical, digest_size=16).digest()
+
+
+async def stored_content_hash(model, fixture_id, db):
+    # lambda_stmt caches the statement construction; only fixture_id changes per call
+    result = await db.execute(
+        lambda_stmt(lambda: select(model.content_hash).where(model.fixture_id == fixture_id).limit(1))
+    )
+    return result.scalar_one_or_none()
+
+
+async def store_prediction_for_fixture(fixture_id, predictions_response, db):
+    try:
         if not predictions_response:
-            logger.info(f"No prediction available for fixture {fixture_id}.")
+            logger.info("No prediction available for fixture %s.", fixture_id)
             return
 
         prediction_data = predictions_response[0]
+        content_hash = payload_hash(prediction_data)
         predictions = prediction_data.get("predictions", {})
         winner = predictions.get("winner", {})
         win_or_draw = predictions.get("win_or_draw")
@@ -120,248 +531,277 @@ async def fetch_and_store_prediction_for_fixture(fixture_id, client, db, headers
         percent = predictions.get("percent", {})
         comparison = prediction_data.get("comparison", {})
 
-        existing_prediction_result = await db.execute(
-            select(models.Prediction).where(models.Prediction.fixture_id == fixture_id)
-        )
-        existing_prediction = existing_prediction_result.scalars().first()
-
-        if existing_prediction:
-            existing_prediction.winner_team_id = winner.get("id")
-            existing_prediction.win_or_draw = win_or_draw
-            existing_prediction.under_over = under_over
-            existing_prediction.goals_home = goals.get("home")
-            existing_prediction.goals_away = goals.get("away")
-            existing_prediction.advice = advice
-            existing_prediction.percent_home = percent.get("home")
-            existing_prediction.percent_draw = percent.get("draw")
-            existing_prediction.percent_away = percent.get("away")
-            existing_prediction.comparison = comparison
-        else:
-            prediction = models.Prediction(
-                fixture_id=fixture_id,
-                winner_team_id=winner.get("id"),
-                win_or_draw=win_or_draw,
-                under_over=under_over,
-                goals_home=goals.get("home"),
-                goals_away=goals.get("away"),
-                advice=advice,
-                percent_home=percent.get("home"),
-                percent_draw=percent.get("draw"),
-                percent_away=percent.get("away"),
-                comparison=comparison
-            )
-            db.add(prediction)
-
+        # A single upsert; rows whose content hash matches are left untouched
+        result = await db.execute(PREDICTION_UPSERT, {
+            'fixture_id': fixture_id,
+            'winner_team_id': winner.get("id"),
+            'win_or_draw': win_or_draw,
+            'under_over': under_over,
+            'goals_home': goals.get("home"),
+            'goals_away': goals.get("away"),
+            'advice': advice,
+            'percent_home': percent.get("home"),
+            'percent_draw': percent.get("draw"),
+            'percent_away': percent.get("away"),
+            'comparison': comparison,
+            'content_hash': content_hash,
+        })
         await db.commit()
-        logger.info(f"Stored prediction for fixture {fixture_id}.")
+        if result.rowcount == 0:
+            logger.info("Prediction for fixture %s unchanged.", fixture_id)
+        else:
+            logger.info("Stored prediction for fixture %s.", fixture_id)
+        return True
 
     except IntegrityError as ie:
         await db.rollback()
-        logger.error(f"Integrity error while storing prediction for fixture {fixture_id}: {ie}", exc_info=True)
+        logger.error("Integrity error while storing prediction for fixture %s: %s", fixture_id, ie, exc_info=True)
     except Exception as e:
         await db.rollback()
-        logger.error(f"Error fetching prediction for fixture {fixture_id}: {e}", exc_info=True)
+        logger.error("Error storing prediction for fixture %s: %s", fixture_id, e, exc_info=True)
 
 
-async def fetch_and_store_odds_for_fixture(fixture_id, client, db, headers):
+async def store_odds_for_fixture(fixture_id, odds_response, db, known_ids=None):
     try:
-        params = {'fixture': fixture_id}
-        response = await client.get("https://v3.football.api-sports.io/odds", headers=headers, params=params)
-
-        if response.status_code != 200:
-            logger.error(f"Failed to fetch odds for fixture {fixture_id}: {response.text}")
-            return
-
-        data = response.json()
-        odds_response = data.get("response", [])
-
         if not odds_response:
-            logger.info(f"No odds available for fixture {fixture_id}.")
+            logger.info("No odds available for fixture %s.", fixture_id)
             return
 
-        await db.execute(
-            delete(models.FixtureOdds).where(models.FixtureOdds.fixture_id == fixture_id)
+        # A fixture can come back as several entries (e.g. from the league day
+        # request), so merge them first: later updates win per bookmaker and bet.
+        entries = sorted(
+            (
+                (parse_api_datetime(odds_data.get("update")), odds_data)
+                for odds_data in odds_response
+                if odds_data.get("fixture", {}).get("id") == fixture_id
+            ),
+            key=lambda entry: entry[0]
         )
-        await db.commit()
-
-        for odds_data in odds_response:
-            fixture_info = odds_data.get("fixture", {})
-            fixture_id_resp = fixture_info.get("id")
-            if fixture_id_resp != fixture_id:
-                continue
-
-            update_time_str = odds_data.get("update")
-            update_time = datetime.fromisoformat(update_time_str.replace('Z', '+00:00'))
-
-            fixture_odds = models.FixtureOdds(
-                fixture_id=fixture_id,
-                update_time=update_time
-            )
-            db.add(fixture_odds)
-            await db.commit()
-            await db.refresh(fixture_odds)
+        if not entries:
+            logger.info("No odds available for fixture %s.", fixture_id)
+            return
 
+        update_time = entries[-1][0]
+        bookmakers_data = {}
+        for _, odds_data in entries:
             for bookmaker_data in odds_data.get("bookmakers", []):
-                bookmaker_id = bookmaker_data.get("id")
-                bookmaker_name = bookmaker_data.get("name")
-
-                bookmaker_result = await db.execute(
-                    select(models.Bookmaker).where(models.Bookmaker.id == bookmaker_id)
+                merged = bookmakers_data.setdefault(
+                    bookmaker_data.get("id"), {"id": bookmaker_data.get("id"), "bets": {}}
                 )
-                bookmaker = bookmaker_result.scalars().first()
-
-                if not bookmaker:
-                    bookmaker = models.Bookmaker(id=bookmaker_id, name=bookmaker_name)
-                    db.add(bookmaker)
-                    try:
-                        await db.commit()
-                    except IntegrityError:
-                        await db.rollback()
-                        bookmaker = await db.get(models.Bookmaker, bookmaker_id)
-
-                fixture_bookmaker = models.FixtureBookmaker(
-                    fixture_odds_id=fixture_odds.id,
-                    bookmaker_id=bookmaker.id
-                )
-                db.add(fixture_bookmaker)
-                await db.commit()
-                await db.refresh(fixture_bookmaker)
-
+                merged["name"] = bookmaker_data.get("name")
                 for bet_data in bookmaker_data.get("bets", []):
-                    bet_type_id = bet_data.get("id")
-                    bet_type_name = bet_data.get("name")
-
-                    bet_type = await db.get(models.BetType, bet_type_id)
-                    if not bet_type:
-                        bet_type = models.BetType(id=bet_type_id, name=bet_type_name)
-                        db.add(bet_type)
-                        try:
-                            await db.commit()
-                        except IntegrityError:
-                            await db.rollback()
-                            bet_type = await db.get(models.BetType, bet_type_id)
-
-                    bet = models.Bet(
-                        fixture_bookmaker_id=fixture_bookmaker.id,
-                        bet_type_id=bet_type.id
-                    )
-                    db.add(bet)
-                    await db.commit()
-                    await db.refresh(bet)
-
-                    for value_data in bet_data.get("values", []):
-                        value = str(value_data.get("value"))
-                        odd = value_data.get("odd")
-
-                        odd_value = models.OddValue(
-                            bet_id=bet.id,
-                            value=value,
-                            odd=odd
-                        )
-                        db.add(odd_value)
+                    merged["bets"][bet_data.get("id")] = bet_data
+        for merged in bookmakers_data.values():
+            merged["bets"] = list(merged["bets"].values())
+
+        # The odds tree is then upserted in place, one statement per level, and
+        # rows missing from the merged payload are deleted once all levels are
+        # written. Each level is keyed by its unique columns.
+        new_ids = await store_bookmakers_and_bet_types(bookmakers_data.values(), db, known_ids)
+
+        fixture_odds_id = await db.scalar(
+            pg_insert(models.FixtureOdds)
+            .values(fixture_id=fixture_id, update_time=update_time)
+            .on_conflict_do_update(
+                index_elements=[models.FixtureOdds.fixture_id],
+                set_={'update_time': update_time}
+            )
+            .returning(models.FixtureOdds.id)
+        )
+
+        # bookmaker_id -> fixture_bookmakers.id
+        fixture_bookmaker_ids = {}
+        if bookmakers_data:
+            fixture_bookmaker_ids = {
+                bookmaker_id: fixture_bookmaker_id
+                for fixture_bookmaker_id, bookmaker_id in (await db.execute(
+                    FIXTURE_BOOKMAKER_UPSERT,
+                    [
+                        {'fixture_odds_id': fixture_odds_id, 'bookmaker_id': bookmaker_id}
+                        for bookmaker_id in bookmakers_data
+                    ]
+                )).all()
+            }
+
+        bets_data = {}
+        for bookmaker_id, bookmaker_data in bookmakers_data.items():
+            for bet_data in bookmaker_data["bets"]:
+                bets_data[(fixture_bookmaker_ids[bookmaker_id], bet_data.get("id"))] = bet_data.get("values", [])
+
+        # (fixture_bookmaker_id, bet_type_id) -> bets.id
+        bet_ids = {}
+        if bets_data:
+            bet_ids = {
+                (fixture_bookmaker_id, bet_type_id): bet_id
+                for bet_id, fixture_bookmaker_id, bet_type_id in (await db.execute(
+                    BET_UPSERT,
+                    [
+                        {'fixture_bookmaker_id': fixture_bookmaker_id, 'bet_type_id': bet_type_id}
+                        for fixture_bookmaker_id, bet_type_id in bets_data
+                    ]
+                )).all()
+            }
+
+        odd_values = {}
+        for bet_key, values_data in bets_data.items():
+            for value_data in values_data:
+                odd_values[(bet_ids[bet_key], str(value_data.get("value")))] = value_data.get("odd")
+
+        odd_value_rows = [(bet_id, value, odd) for (bet_id, value), odd in odd_values.items()]
+        if len(odd_value_rows) > ODD_VALUES_COPY_THRESHOLD:
+            await crud.copy_upsert_records(
+                db, models.OddValue.__tablename__, ODD_VALUE_COLUMNS, odd_value_rows,
+                conflict_columns=('bet_id', 'value'), update_columns=('odd',)
+            )
+        elif odd_value_rows:
+            await db.execute(
+                ODD_VALUE_UPSERT,
+                [dict(zip(ODD_VALUE_COLUMNS, row)) for row in odd_value_rows]
+            )
+        if bet_ids:
+            await db.execute(
+                delete(models.OddValue).where(
+                    models.OddValue.bet_id.in_(list(bet_ids.values())),
+                    tuple_(models.OddValue.bet_id, models.OddValue.value).not_in(list(odd_values))
+                )
+            )
+        await db.execute(
+            delete(models.Bet).where(
+                models.Bet.fixture_bookmaker_id.in_(list(fixture_bookmaker_ids.values())),
+                models.Bet.id.not_in(list(bet_ids.values()))
+            )
+        )
+        await db.execute(
+            delete(models.FixtureBookmaker).where(
+                models.FixtureBookmaker.fixture_odds_id == fixture_odds_id,
+                models.FixtureBookmaker.id.not_in(list(fixture_bookmaker_ids.values()))
+            )
+        )
 
         await db.commit()
-        logger.info(f"Stored odds for fixture {fixture_id}.")
+        # Only remember the new reference ids once they are committed
+        if known_ids is not None:
+            known_ids['bookmakers'] |= new_ids['bookmakers']
+            known_ids['bet_types'] |= new_ids['bet_types']
+        logger.info("Stored odds for fixture %s.", fixture_id)
+        return True
 
     except IntegrityError as ie:
         await db.rollback()
-        logger.error(f"IntegrityError while handling odds for fixture {fixture_id}: {ie}", exc_info=True)
+        logger.error("IntegrityError while handling odds for fixture %s: %s", fixture_id, ie, exc_info=True)
     except Exception as e:
         await db.rollback()
-        logger.error(f"Error fetching odds for fixture {fixture_id}: {e}", exc_info=True)
+        logger.error("Error storing odds for fixture %s: %s", fixture_id, e, exc_info=True)
 
 
-async def fetch_and_store_match_statistics(fixture_id, client, db, headers):
-    try:
-        params = {'fixture': fixture_id}
-        response = await client.get(
-            "https://v3.football.api-sports.io/fixtures/statistics",
-            headers=headers,
-            params=params
-        )
+async def load_odds_reference_ids(db):
+    # Bookmakers and bet types are near-static; load their ids once per run
+    bookmaker_ids = await db.scalars(select(models.Bookmaker.id))
+    bet_type_ids = await db.scalars(select(models.BetType.id))
+    return {'bookmakers': set(bookmaker_ids), 'bet_types': set(bet_type_ids)}
 
-        if response.status_code != 200:
-            logger.error(f"Failed to fetch statistics for fixture {fixture_id}: {response.text}")
-            return
 
-        data = response.json()
-        statistics_response = data.get("response", [])
+async def store_bookmakers_and_bet_types(bookmakers_data, db, known_ids=None):
+    known_ids = known_ids or {'bookmakers': set(), 'bet_types': set()}
+    bookmakers = {}
+    bet_types = {}
+    for bookmaker_data in bookmakers_data:
+        if bookmaker_data.get("id") not in known_ids['bookmakers']:
+            bookmakers[bookmaker_data.get("id")] = bookmaker_data.get("name")
+        for bet_data in bookmaker_data.get("bets", []):
+            if bet_data.get("id") not in known_ids['bet_types']:
+                bet_types[bet_data.get("id")] = bet_data.get("name")
+
+    if bookmakers:
+        await db.execute(
+            BOOKMAKER_INSERT,
+            [{'id': bookmaker_id, 'name': name} for bookmaker_id, name in bookmakers.items()]
+        )
+    if bet_types:
+        await db.execute(
+            BET_TYPE_INSERT,
+            [{'id': bet_type_id, 'name': name} for bet_type_id, name in bet_types.items()]
+        )
+    return {'bookmakers': set(bookmakers), 'bet_types': set(bet_types)}
+
 
+async def store_match_statistics(fixture_id, statistics_response, db):
+    try:
         if not statistics_response:
-            logger.info(f"No statistics available for fixture {fixture_id}.")
+            logger.info("No statistics available for fixture %s.", fixture_id)
             return
 
+        content_hash = payload_hash(statistics_response)
+        if await stored_content_hash(models.MatchStatistics, fixture_id, db) == content_hash:
+            logger.info("Statistics for fixture %s unchanged.", fixture_id)
+            return True
+
         await db.execute(
             delete(models.MatchStatistics).where(models.MatchStatistics.fixture_id == fixture_id)
         )
-        await db.commit()
 
-        for stat in statistics_response:
-            team_id = stat.get("team", {}).get("id")
-            statistics = stat.get("statistics", [])
-            match_statistics = models.MatchStatistics(
-                fixture_id=fixture_id,
-                team_id=team_id,
-                statistics=statistics
-            )
-            db.add(match_statistics)
+        statistics_rows = [
+            {
+                "fixture_id": fixture_id,
+                "team_id": stat.get("team", {}).get("id"),
+                "statistics": stat.get("statistics", []),
+                "content_hash": content_hash,
+            }
+            for stat in statistics_response
+        ]
+        await db.execute(MATCH_STATISTICS_INSERT, statistics_rows)
 
         await db.commit()
-        logger.info(f"Stored statistics for fixture {fixture_id}.")
+        logger.info("Stored statistics for fixture %s.", fixture_id)
+        return True
 
     except Exception as e:
         await db.rollback()
-        logger.error(f"Error fetching statistics for fixture {fixture_id}: {e}", exc_info=True)
+        logger.error("Error storing statistics for fixture %s: %s", fixture_id, e, exc_info=True)
 
 
-async def fetch_and_store_match_events(fixture_id, client, db, headers):
+async def store_match_events(fixture_id, events_response, db):
     try:
-        params = {'fixture': fixture_id}
-        response = await client.get(
-            "https://v3.football.api-sports.io/fixtures/events",
-            headers=headers,
-            params=params
-        )
-
-        if response.status_code != 200:
-            logger.error(f"Failed to fetch events for fixture {fixture_id}: {response.text}")
-            return
-
-        data = response.json()
-        events_response = data.get("response", [])
-
         if not events_response:
-            logger.info(f"No events available for fixture {fixture_id}.")
+            logger.info("No events available for fixture %s.", fixture_id)
             return
 
+        content_hash = payload_hash(events_response)
+        if await stored_content_hash(models.MatchEvent, fixture_id, db) == content_hash:
+            logger.info("Events for fixture %s unchanged.", fixture_id)
+            return True
+
         await db.execute(
             delete(models.MatchEvent).where(models.MatchEvent.fixture_id == fixture_id)
         )
-        await db.commit()
 
         try:
-            for event_data in events_response:
-                event = models.MatchEvent(
-                    fixture_id=fixture_id,
-                    minute=event_data['time']['elapsed'],
-                    team_id=event_data['team']['id'],
-                    player_id=event_data.get('player', {}).get('id'),
-                    player_name=event_data.get('player', {}).get('name'),
-                    type=event_data['type'],
-                    detail=event_data['detail'],
-                    comments=event_data.get('comments')
-                )
-                db.add(event)
+            event_rows = [
+                {
+                    "fixture_id": fixture_id,
+                    "minute": event_data['time']['elapsed'],
+                    "team_id": event_data['team']['id'],
+                    "player_id": event_data.get('player', {}).get('id'),
+                    "player_name": event_data.get('player', {}).get('name'),
+                    "type": event_data['type'],
+                    "detail": event_data['detail'],
+                    "comments": event_data.get('comments'),
+                    "content_hash": content_hash,
+                }
+                for event_data in events_response
+            ]
+            await db.execute(MATCH_EVENT_INSERT, event_rows)
 
             await db.commit()
-            logger.info(f"Stored events for {fixture_id}.")
+            logger.info("Stored events for %s.", fixture_id)
+            return True
         except IntegrityError as ie:
             await db.rollback()
-            logger.error(f"IntegrityError storing events for fixture {fixture_id}: {ie}", exc_info=True)
+            logger.error("IntegrityError storing events for fixture %s: %s", fixture_id, ie, exc_info=True)
         except Exception as e:
             await db.rollback()
-            logger.error(f"Error fetching events for fixture {fixture_id}: {e}", exc_info=True)
+            logger.error("Error storing events for fixture %s: %s", fixture_id, e, exc_info=True)
 
     except Exception as e:
         await db.rollback()
-        logger.error(f"Error fetching events for fixture {fixture_id}: {e}", exc_info=True)
+        logger.error("Error storing events for fixture %s: %s", fixture_id, e, exc_info=True)
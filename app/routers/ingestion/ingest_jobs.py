@@ -0,0 +1,17 @@
+# app/routers/ingestion/ingest_jobs.py
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from app.jobs import JobQueue, get_job_queue
+
+router = APIRouter(
+    prefix="/ingest",
+    tags=["ingestion"]
+)
+
+@router.get("/jobs/{job_id}", response_model=dict)
+async def get_ingestion_job(job_id: str, jobs: JobQueue = Depends(get_job_queue)):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
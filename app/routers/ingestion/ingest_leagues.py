@@ -1,14 +1,17 @@
 # app/routers/ingest_leagues.py
 
+import asyncio
 import logging
 import os
 import httpx
-from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from app.database import get_db
+from app.http_clients import API_FOOTBALL_BASE_URL, api_get, get_api_client, parse_response
+from app.parsers import parse_api_date
 from app import models
 
 router = APIRouter(
@@ -17,183 +20,188 @@ router = APIRouter(
 )
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG) 
 
 API_FOOTBALL_KEY = os.getenv("API_FOOTBALL_KEY")
 
+LEAGUE_FETCH_CONCURRENCY = 5
+
+LEAGUES_URL = httpx.URL(f"{API_FOOTBALL_BASE_URL}/leagues")
+
+# Premier League, Serie A, La Liga, Bundesliga, Ligue 1, Europa league, Champions league
+LEAGUE_IDS = frozenset((39, 135, 140, 78, 61, 3, 2))
+
+# ETag of the last stored response per league; an unchanged league comes back as a 304
+league_etags = {}
+
 @router.post("/", response_model=dict)
-async def fetch_and_store_leagues(db: AsyncSession = Depends(get_db)):
+async def fetch_and_store_leagues(
+    db: AsyncSession = Depends(get_db),
+    client: httpx.AsyncClient = Depends(get_api_client)
+):
     logger.info("Starting leagues ingestion.")
-    # Debug: Current league ids selected
-    league_ids = [39, 135, 140, 78, 61, 3, 2]  # Premier League, Serie A, La Liga, Bundesliga, Ligue 1, Europa league, Champions league
-    logger.debug(f"Target league_ids: {league_ids}")
+    logger.debug("Target league_ids: %s", sorted(LEAGUE_IDS))
 
     # Validate API key
     if not API_FOOTBALL_KEY:
         logger.error("API_FOOTBALL_KEY environment variable is not set.")
         raise HTTPException(status_code=500, detail="API key not configured.")
 
-    headers = {
-        'x-apisports-key': API_FOOTBALL_KEY,
-        'Accept': 'application/json'
-    }
+    # Fetch all leagues concurrently, then write them one at a time on the session
+    semaphore = asyncio.Semaphore(LEAGUE_FETCH_CONCURRENCY)
+    results = await asyncio.gather(*(fetch_league(league_id, semaphore, client) for league_id in LEAGUE_IDS))
 
-    async with httpx.AsyncClient() as client:
-        for league_id in league_ids:
-            url = "https://v3.football.api-sports.io/leagues"
-            params = {
-                'id': league_id
-            }
+    # Load the stored league ids once instead of checking each league separately
+    known_league_ids = set(await db.scalars(select(models.League.league_id)))
 
-            logger.debug(f"Fetching league data from {url} with params {params}")
-            try:
-                response = await client.get(url, headers=headers, params=params)
-            except httpx.RequestError as e:
-                logger.error(f"Request error for league {league_id}: {e}")
-                continue  
+    for league_id, data, etag in results:
+        if data is None:
+            continue
 
-            logger.debug(f"API response status for league {league_id}: {response.status_code}")
+        league_response = data.get("response", [])
+        if not league_response:
+            logger.warning("No data found for league %s in API response.", league_id)
+            continue 
 
-            if response.status_code != 200:
-                logger.error(f"API Error for league {league_id}: {response.status_code} - {response.text}")
-                continue  
+        # Extract league info
+        league_info_data = league_response[0].get("league", {})
+        country_info = league_response[0].get("country", {})
+        seasons_data = league_response[0].get("seasons", [])
 
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("League %s info: %s", league_id, league_info_data)
+            logger.debug("League %s country info: %s", league_id, country_info)
+            logger.debug("League %s seasons: %s", league_id, seasons_data)
+
+        league_name = league_info_data.get("name")
+        if league_id not in known_league_ids:
+            try:
+                logger.debug("Inserting new league: %s (ID: %s)", league_name, league_id)
+                # ON CONFLICT keeps this safe if another run inserted the league meanwhile
+                await db.execute(
+                    pg_insert(models.League).values(
+                        league_id=league_id,
+                        name=league_name,
+                        type=league_info_data.get("type"),
+                        logo=league_info_data.get("logo"),
+                        country_name=country_info.get("name"),
+                        country_code=country_info.get("code"),
+                        country_flag=country_info.get("flag"),
+                    ).on_conflict_do_nothing(index_elements=[models.League.league_id])
+                )
+            except Exception as e:
+                logger.error("Error inserting league %s: %s", league_id, e)
+                await db.rollback()
+                continue  # Skip processing seasons for this league
+        else:
+            logger.info("League %s (ID: %s) already exists in the database.", league_name, league_id)
+
+        # Process seasons: Only current season
+        current_seasons = [s for s in seasons_data if s.get("current")]
+        if not current_seasons:
+            logger.warning("No current season found for league %s.", league_id)
+
+        # The league and its seasons are committed together, once per league
+        seasons_failed = False
+        for season in current_seasons:
             try:
-                data = response.json()
-                logger.debug(f"League {league_id} raw API response: {data}")
-            except ValueError as e:
-                logger.error(f"JSON decoding error for league {league_id}: {e}")
-                continue  #
-
-            league_response = data.get("response", [])
-            if not league_response:
-                logger.warning(f"No data found for league {league_id} in API response.")
-                continue 
-
-            # Extract league info
-            league_info_data = league_response[0].get("league", {})
-            country_info = league_response[0].get("country", {})
-            seasons_data = league_response[0].get("seasons", [])
-
-            logger.debug(f"League {league_id} info: {league_info_data}")
-            logger.debug(f"League {league_id} country info: {country_info}")
-            logger.debug(f"League {league_id} seasons: {seasons_data}")
-
-            # Create league model instance
-            league = models.League(
-                league_id=league_id,
-                name=league_info_data.get("name"),
-                type=league_info_data.get("type"),
-                logo=league_info_data.get("logo"),
-                country_name=country_info.get("name"),
-                country_code=country_info.get("code"),
-                country_flag=country_info.get("flag"),
-            )
-
-            # Check if the league already exists
-            existing_league_query = select(models.League).filter(models.League.league_id == league.league_id)
-            existing_league_result = await db.execute(existing_league_query)
-            existing_league = existing_league_result.scalars().one_or_none()
-
-            if not existing_league:
-                try:
-                    logger.debug(f"Inserting new league: {league.name} (ID: {league_id})")
-                    db.add(league)
-                    await db.commit()
-                    await db.refresh(league)
-                    logger.info(f"League {league.name} (ID: {league_id}) added to the database.")
-                except Exception as e:
-                    logger.error(f"Error inserting league {league_id}: {e}")
-                    await db.rollback()
-                    continue  # Skip processing seasons for this league
-            else:
-                logger.info(f"League {league.name} (ID: {league_id}) already exists in the database.")
-                league = existing_league
-
-            # Process seasons: Only current season
-            current_seasons = [s for s in seasons_data if s.get("current")]
-            if not current_seasons:
-                logger.warning(f"No current season found for league {league_id}.")
+                start_date = parse_api_date(season["start"]) if season.get("start") else None
+                end_date = parse_api_date(season["end"]) if season.get("end") else None
+            except ValueError as date_exception:
+                logger.error("Date parsing error for league %s season: %s", league_id, date_exception)
                 continue  
 
-            for season in current_seasons:
-                start_date, end_date = None, None
-                try:
-                    if season.get("start"):
-                        start_date = datetime.strptime(season.get("start"), "%Y-%m-%d").date()
-                    if season.get("end"):
-                        end_date = datetime.strptime(season.get("end"), "%Y-%m-%d").date()
-                except Exception as date_exception:
-                    logger.error(f"Date parsing error for league {league_id} season: {date_exception}")
-                    continue  
-
-                season_year = season.get("year")
-                current_season_flag = season.get("current") or False
-
-                logger.debug(f"League {league_id} - Found current season: Year={season_year}, Current={current_season_flag}, Start={start_date}, End={end_date}")
-
-                # Ensure only one current season per league
-                # Mark existing current seasons as False
-                try:
-                    update_stmt = update(models.Season).where(
-                        models.Season.league_id == league_id,
-                        models.Season.current == True
-                    ).values(current=False)
-                    await db.execute(update_stmt)
-                    logger.debug(f"Marked all existing seasons for league {league_id} as non-current.")
-                except Exception as e:
-                    logger.error(f"Error updating existing seasons for league {league_id}: {e}")
-                    await db.rollback()
-                    continue  # Skip updating current season
-
-                # Create or update the current season
-                season_data_obj = models.Season(
+            season_year = season.get("year")
+            current_season_flag = season.get("current") or False
+
+            logger.debug("League %s - Found current season: Year=%s, Current=%s, Start=%s, End=%s", league_id, season_year, current_season_flag, start_date, end_date)
+
+            # Upsert the current season, then make sure it's the league's only current one
+            try:
+                season_stmt = pg_insert(models.Season).values(
                     league_id=league_id,
                     year=season_year,
-                    start_date=start_date,    
-                    end_date=end_date,        
+                    start_date=start_date,
+                    end_date=end_date,
                     current=current_season_flag,
                     coverage=season.get("coverage")
                 )
-
-                # Check if the current season already exists
-                existing_season_query = select(models.Season).filter(
-                    models.Season.league_id == league_id,
-                    models.Season.year == season_year
+                await db.execute(
+                    season_stmt.on_conflict_do_update(
+                        index_elements=[models.Season.league_id, models.Season.year],
+                        set_={
+                            'current': season_stmt.excluded.current,
+                            'start_date': season_stmt.excluded.start_date,
+                            'end_date': season_stmt.excluded.end_date,
+                            'coverage': season_stmt.excluded.coverage,
+                        }
+                    )
+                )
+                await db.execute(
+                    update(models.Season).where(
+                        models.Season.league_id == league_id,
+                        models.Season.year != season_year,
+                        models.Season.current == True
+                    ).values(current=False)
                 )
-                existing_season_result = await db.execute(existing_season_query)
-                existing_season = existing_season_result.scalars().one_or_none()
-
-                if not existing_season:
-                    try:
-                        logger.debug(f"Inserting new current season for league {league_id}, year {season_year}")
-                        db.add(season_data_obj)
-                        await db.commit()
-                        await db.refresh(season_data_obj)
-                        logger.info(f"Season {season_data_obj.year} for league ID {league_id} added to the database.")
-                    except Exception as e:
-                        logger.error(f"Error inserting season {season_year} for league {league_id}: {e}")
-                        await db.rollback()
-                        continue  
-                else:
-                    try:
-                        logger.debug(f"Updating existing current season for league {league_id}, year {season_year}")
-                        existing_season.current = current_season_flag
-                        existing_season.start_date = start_date    
-                        existing_season.end_date = end_date        
-                        existing_season.coverage = season.get("coverage")
-                        await db.commit()
-                        logger.info(f"Season {existing_season.year} for league ID {league_id} updated in the database.")
-                    except Exception as e:
-                        logger.error(f"Error updating season {season_year} for league {league_id}: {e}")
-                        await db.rollback()
-                        continue  
-
-    # log what leagues are in the database
-    all_leagues = await db.execute(select(models.League))
-    leagues_in_db = all_leagues.scalars().all()
-    logger.debug("Leagues currently in DB:")
-    for lg in leagues_in_db:
-        logger.debug(f" - ID: {lg.league_id}, Name: {lg.name}")
+                logger.info("Season %s for league ID %s stored in the database.", season_year, league_id)
+            except Exception as e:
+                logger.error("Error storing season %s for league %s: %s", season_year, league_id, e)
+                await db.rollback()
+                seasons_failed = True
+                break
+
+        if seasons_failed:
+            continue
+
+        await db.commit()
+        # Only remember the ETag once the league is stored, so a failed run refetches it
+        if etag:
+            league_etags[league_id] = etag
+        if league_id not in known_league_ids:
+            known_league_ids.add(league_id)
+            logger.info("League %s (ID: %s) added to the database.", league_name, league_id)
+
+    # log what leagues are in the database; the query only runs when debugging
+    if logger.isEnabledFor(logging.DEBUG):
+        all_leagues = await db.execute(select(models.League.league_id, models.League.name))
+        logger.debug("Leagues currently in DB:")
+        for lg in all_leagues:
+            logger.debug(" - ID: %s, Name: %s", lg.league_id, lg.name)
 
     return {"message": "Leagues and current seasons fetched and stored successfully"}
+
+
+async def fetch_league(league_id, semaphore, client):
+    params = {
+        'id': league_id
+    }
+
+    headers = {'If-None-Match': league_etags[league_id]} if league_id in league_etags else None
+
+    logger.debug("Fetching league data from %s with params %s", LEAGUES_URL, params)
+    async with semaphore:
+        try:
+            response = await api_get(client, LEAGUES_URL, params=params, headers=headers)
+        except httpx.RequestError as e:
+            logger.error("Request error for league %s: %s", league_id, e)
+            return league_id, None, None
+
+    logger.debug("API response status for league %s: %s", league_id, response.status_code)
+
+    if response.status_code == 304:
+        logger.info("League %s not modified since the last ingestion.", league_id)
+        return league_id, None, None
+
+    if response.status_code != 200:
+        logger.error("API Error for league %s: %s - %s", league_id, response.status_code, response.text)
+        return league_id, None, None
+
+    try:
+        data = parse_response(response)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("League %s raw API response: %s", league_id, data)
+    except ValueError as e:
+        logger.error("JSON decoding error for league %s: %s", league_id, e)
+        return league_id, None, None
+
+    return league_id, data, response.headers.get("ETag")
@@ -1,15 +1,28 @@
 # app/routers/ingestion/odds.py
 
+import asyncio
 import logging
 import os
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+from sqlalchemy import select
 import httpx
 
+from app.cache import fixtures_response_cache
 from app.database import get_db
+from app.http_clients import get_api_client
 from app import models
+from app.routers.ingestion.ingest_fixtures_data import (
+    FIXTURE_ENDPOINTS,
+    UNCHANGED,
+    fetch_fixture_endpoint,
+    finish_producing,
+    load_odds_reference_ids,
+    odds_updated_since,
+    run_until_first_error,
+    store_odds_for_fixture,
+)
 
 router = APIRouter(
     prefix="/odds",
@@ -18,157 +31,86 @@ router = APIRouter(
 
 API_FOOTBALL_KEY = os.getenv("API_FOOTBALL_KEY")
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+ODDS_FETCH_CONCURRENCY = 10
+ODDS_QUEUE_SIZE = 32
+
 @router.post("/", response_model=dict)
-async def fetch_and_store_odds(db: AsyncSession = Depends(get_db)):
+async def fetch_and_store_odds(
+    db: AsyncSession = Depends(get_db),
+    client: httpx.AsyncClient = Depends(get_api_client)
+):
     logger.info("Starting the odds ingestion process.")
     try:
         if not API_FOOTBALL_KEY:
             logger.error("API_FOOTBALL_KEY environment variable is not set.")
             raise HTTPException(status_code=500, detail="API key not configured.")
 
-        headers = {
-            'x-apisports-key': API_FOOTBALL_KEY,
-            'Accept': 'application/json'
-        }
-
-        async with httpx.AsyncClient() as client:
-            # Fetch fixtures within a certain date range 
-            start_date = datetime.utcnow()
-            end_date = start_date + timedelta(days=14)
-            fixtures_result = await db.execute(
-                select(models.Fixture.fixture_id).filter(
-                    models.Fixture.date >= start_date,
-                    models.Fixture.date <= end_date
-                )
+        # Fetch fixtures within a certain date range 
+        start_date = datetime.utcnow()
+        end_date = start_date + timedelta(days=14)
+        fixtures_result = await db.execute(
+            select(models.Fixture.fixture_id, models.FixtureOdds.update_time)
+            .outerjoin(models.FixtureOdds, models.FixtureOdds.fixture_id == models.Fixture.fixture_id)
+            .filter(
+                models.Fixture.date >= start_date,
+                models.Fixture.date <= end_date
             )
-            fixture_ids = [fixture_id for (fixture_id,) in fixtures_result.fetchall()]
-
-            if not fixture_ids:
-                logger.info("No fixtures found within the specified date range.")
-                return {"message": "No fixtures found within the specified date range."}
-
-            odds_processed = 0
-
-            for fixture_id in fixture_ids:
-                logger.info(f"Fetching odds for fixture ID: {fixture_id}")
-                params = {
-                    'fixture': fixture_id
-                }
-
-                response = await client.get(
-                    "https://v3.football.api-sports.io/odds",
-                    headers=headers,
-                    params=params
-                )
-
-                if response.status_code != 200:
-                    logger.error(f"Failed to fetch odds for fixture {fixture_id}: {response.text}")
-                    continue
-
-                data = response.json()
-                odds_response = data.get("response", [])
-
-                if not odds_response:
-                    logger.info(f"No odds available for fixture {fixture_id}.")
-                    continue
-
-                # Delete existing odds for this fixture
-                await db.execute(
-                    delete(models.FixtureOdds).where(models.FixtureOdds.fixture_id == fixture_id)
-                )
-                await db.commit()
-
-                # Process odds data
-                for odds_data in odds_response:
-                    fixture_info = odds_data.get("fixture", {})
-                    fixture_id_response = fixture_info.get("id")
-
-                    if fixture_id_response != fixture_id:
-                        continue
-
-                    # Extract update time
-                    update_time_str = odds_data.get("update")
-                    update_time = datetime.fromisoformat(update_time_str.replace('Z', '+00:00'))
-
-                    # Create FixtureOdds
-                    fixture_odds = models.FixtureOdds(
-                        fixture_id=fixture_id,
-                        update_time=update_time
-                    )
-                    db.add(fixture_odds)
-                    await db.commit()
-                    await db.refresh(fixture_odds)
-
-                    # Process bookmakers
-                    for bookmaker_data in odds_data.get("bookmakers", []):
-                        bookmaker_id = bookmaker_data.get("id")
-                        bookmaker_name = bookmaker_data.get("name")
-
-                        # Get or create Bookmaker
-                        bookmaker = await db.get(models.Bookmaker, bookmaker_id)
-                        if not bookmaker:
-                            bookmaker = models.Bookmaker(
-                                id=bookmaker_id,
-                                name=bookmaker_name
-                            )
-                            db.add(bookmaker)
-                            await db.commit()
-                            await db.refresh(bookmaker)
-
-                        fixture_bookmaker = models.FixtureBookmaker(
-                            fixture_odds_id=fixture_odds.id,
-                            bookmaker_id=bookmaker.id
-                        )
-                        db.add(fixture_bookmaker)
-                        await db.commit()
-                        await db.refresh(fixture_bookmaker)
-
-                        # Process bets
-                        for bet_data in bookmaker_data.get("bets", []):
-                            bet_type_id = bet_data.get("id")
-                            bet_type_name = bet_data.get("name")
-
-                            # Get or create BetType
-                            bet_type = await db.get(models.BetType, bet_type_id)
-                            if not bet_type:
-                                bet_type = models.BetType(
-                                    id=bet_type_id,
-                                    name=bet_type_name
-                                )
-                                db.add(bet_type)
-                                await db.commit()
-                                await db.refresh(bet_type)
-
-                            bet = models.Bet(
-                                fixture_bookmaker_id=fixture_bookmaker.id,
-                                bet_type_id=bet_type.id
-                            )
-                            db.add(bet)
-                            await db.commit()
-                            await db.refresh(bet)
-
-                            # Process odd values
-                            for value_data in bet_data.get("values", []):
-                                value = str(value_data.get("value"))
-                                odd = value_data.get("odd")
-
-                                odd_value = models.OddValue(
-                                    bet_id=bet.id,
-                                    value=value,
-                                    odd=odd
-                                )
-                                db.add(odd_value)
-
-                    # Commit all odds for this fixture
-                    await db.commit()
-                    odds_processed += 1
-
-            logger.info(f"Finished fetching and storing odds. Total odds processed: {odds_processed}")
-            return {"message": "Odds fetched and stored successfully", "processed": odds_processed}
+        )
+        # Stored odds update times, to skip payloads that haven't changed
+        odds_update_times = dict(fixtures_result.all())
+        fixture_ids = list(odds_update_times)
+
+        if not fixture_ids:
+            logger.info("No fixtures found within the specified date range.")
+            return {"message": "No fixtures found within the specified date range."}
+
+        known_ids = await load_odds_reference_ids(db)
+
+        # Fetch concurrently; a single consumer keeps the session's writes serial
+        semaphore = asyncio.Semaphore(ODDS_FETCH_CONCURRENCY)
+        fetched = asyncio.Queue(maxsize=ODDS_QUEUE_SIZE)
+        producing = asyncio.create_task(finish_producing(fetched, *(
+            fetch_odds_into_queue(fixture_id, odds_update_times[fixture_id], semaphore, client, fetched)
+            for fixture_id in fixture_ids
+        )))
+        consumer = asyncio.create_task(store_odds_worker(fetched, db, known_ids))
+        try:
+            # A failed consumer must not leave the producers blocked on the full queue
+            _, odds_processed = await run_until_first_error(producing, consumer)
+        finally:
+            producing.cancel()
+            consumer.cancel()
+            fixtures_response_cache.clear()
+
+        logger.info("Finished fetching and storing odds. Total odds processed: %s", odds_processed)
+        return {"message": "Odds fetched and stored successfully", "processed": odds_processed}
 
     except Exception as e:
-        logger.error(f"An error occurred during odds ingestion: {e}", exc_info=True)
+        logger.error("An error occurred during odds ingestion: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
+
+
+async def fetch_odds_into_queue(fixture_id, last_update_time, semaphore, client, fetched):
+    async with semaphore:
+        logger.info("Fetching odds for fixture ID: %s", fixture_id)
+        odds_response = await fetch_fixture_endpoint(FIXTURE_ENDPOINTS['odds'], fixture_id, client)
+    if odds_response is None or odds_response is UNCHANGED:
+        return
+    if odds_response and last_update_time and not odds_updated_since(odds_response, last_update_time):
+        logger.info("Odds for fixture %s unchanged since %s.", fixture_id, last_update_time)
+        return
+    await fetched.put((fixture_id, odds_response))
+
+
+async def store_odds_worker(fetched, db, known_ids):
+    odds_processed = 0
+    while True:
+        item = await fetched.get()
+        if item is None:
+            return odds_processed
+
+        fixture_id, odds_response = item
+        if await store_odds_for_fixture(fixture_id, odds_response, db, known_ids):
+            odds_processed += 1
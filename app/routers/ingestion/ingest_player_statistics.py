@@ -3,14 +3,17 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from sqlalchemy.orm import joinedload
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.cache import api_response_cache, cached_get
 from app.database import get_db
-from app import models
+from app.http_clients import API_FOOTBALL_BASE_URL, api_get, get_api_client, parse_response
+from app import crud, models
 import logging
 import os
 import httpx
 import asyncio
-from sqlalchemy.exc import IntegrityError
+import functools
+import hashlib
 
 router = APIRouter(
     prefix="/player_statistics",
@@ -19,8 +22,81 @@ router = APIRouter(
 
 API_FOOTBALL_KEY = os.getenv("API_FOOTBALL_KEY")
 
+PLAYER_STATISTICS_KEY = ('player_id', 'team_id', 'league_id', 'season_year')
+
+# (column, API section, API field) for every stored statistic; the API spells
+# some fields its own way ("appearences", "commited")
+PLAYER_STATISTICS_FIELDS = (
+    ('appearances', 'games', 'appearences'),
+    ('lineups', 'games', 'lineups'),
+    ('minutes', 'games', 'minutes'),
+    ('number', 'games', 'number'),
+    ('position', 'games', 'position'),
+    ('rating', 'games', 'rating'),
+    ('captain', 'games', 'captain'),
+    ('subs_in', 'substitutes', 'in'),
+    ('subs_out', 'substitutes', 'out'),
+    ('subs_bench', 'substitutes', 'bench'),
+    ('shots_total', 'shots', 'total'),
+    ('shots_on', 'shots', 'on'),
+    ('goals_total', 'goals', 'total'),
+    ('goals_conceded', 'goals', 'conceded'),
+    ('goals_assists', 'goals', 'assists'),
+    ('goals_saves', 'goals', 'saves'),
+    ('passes_total', 'passes', 'total'),
+    ('passes_key', 'passes', 'key'),
+    ('passes_accuracy', 'passes', 'accuracy'),
+    ('tackles_total', 'tackles', 'total'),
+    ('tackles_blocks', 'tackles', 'blocks'),
+    ('tackles_interceptions', 'tackles', 'interceptions'),
+    ('duels_total', 'duels', 'total'),
+    ('duels_won', 'duels', 'won'),
+    ('dribbles_attempts', 'dribbles', 'attempts'),
+    ('dribbles_success', 'dribbles', 'success'),
+    ('dribbles_past', 'dribbles', 'past'),
+    ('fouls_drawn', 'fouls', 'drawn'),
+    ('fouls_committed', 'fouls', 'committed'),
+    ('cards_yellow', 'cards', 'yellow'),
+    ('cards_yellowred', 'cards', 'yellowred'),
+    ('cards_red', 'cards', 'red'),
+    ('penalty_won', 'penalty', 'won'),
+    ('penalty_committed', 'penalty', 'commited'),
+    ('penalty_scored', 'penalty', 'scored'),
+    ('penalty_missed', 'penalty', 'missed'),
+    ('penalty_saved', 'penalty', 'saved'),
+)
+
+PLAYER_STATISTICS_COLUMNS = PLAYER_STATISTICS_KEY + tuple(column for column, _, _ in PLAYER_STATISTICS_FIELDS)
+
+# Built once at import and run as an executemany, so the statement is compiled once
+_player_statistics_insert = pg_insert(models.PlayerStatistics)
+PLAYER_STATISTICS_UPSERT = _player_statistics_insert.on_conflict_do_update(
+    constraint='uix_player_team_league_season',
+    set_={
+        column: _player_statistics_insert.excluded[column]
+        for column in PLAYER_STATISTICS_COLUMNS[len(PLAYER_STATISTICS_KEY):]
+    }
+)
+
+# Above this many rows per season, use COPY instead of a multi-row INSERT
+PLAYER_STATISTICS_COPY_THRESHOLD = 100
+
+PLAYER_FETCH_CONCURRENCY = 8
+
+PLAYERS_URL = httpx.URL(f"{API_FOOTBALL_BASE_URL}/players")
+
+# Player pages change at most daily, so a re-run within the day reuses them
+PLAYER_PAGE_TTL = 24 * 60 * 60
+
+# Body hash of each players page as last stored, keyed like the page cache
+stored_page_hashes = {}
+
 @router.post("/", response_model=dict)
-async def fetch_and_store_player_statistics(db: AsyncSession = Depends(get_db)):
+async def fetch_and_store_player_statistics(
+    force: bool = False,
+    db: AsyncSession = Depends(get_db),
+    client: httpx.AsyncClient = Depends(get_api_client)
+):
     try:
         seasons_result = await db.execute(
             select(models.Season).filter(models.Season.current == True)
@@ -35,218 +111,173 @@ async def fetch_and_store_player_statistics(db: AsyncSession = Depends(get_db)):
             logging.error("API_FOOTBALL_KEY environment variable is not set.")
             raise HTTPException(status_code=500, detail="API key not configured.")
 
-        headers = {
-            'x-apisports-key': API_FOOTBALL_KEY,
-            'Accept': 'application/json'
-        }
-
-        async with httpx.AsyncClient() as client:
-            for season in seasons:
-                season_year = season.year
-                league_id = season.league_id
-
-                # Fetch teams via TeamLeague association
-                teams_league_result = await db.execute(
-                    select(models.TeamLeague).filter(
-                        models.TeamLeague.league_id == league_id,
-                        models.TeamLeague.season_year == season_year
-                    ).options(joinedload(models.TeamLeague.team))
-                )
-                teams_league = teams_league_result.scalars().all()
-
-                teams = [tl.team for tl in teams_league]
-
-                if not teams:
-                    logging.warning(f"No teams found for league ID {league_id} and season {season_year}.")
-                    continue  # Skip to the next league
-
-                for team in teams:
-                    team_id = team.team_id
-                    page = 1
-                    total_pages = 1
-
-                    while page <= total_pages:
-                        url = "https://v3.football.api-sports.io/players"
-                        params = {
-                            'team': team_id,
-                            'season': season_year,
-                            'league': league_id,
-                            'page': page
+        for season in seasons:
+            season_year = season.year
+            league_id = season.league_id
+
+            teams = await crud.get_season_teams(db, league_id, season_year)
+
+            if not teams:
+                logging.warning(f"No teams found for league ID {league_id} and season {season_year}.")
+                continue  # Skip to the next league
+
+            # Fetch every team's pages concurrently, then store the season in one go;
+            # the semaphore bounds requests in flight across all teams and pages
+            semaphore = asyncio.Semaphore(PLAYER_FETCH_CONCURRENCY)
+            results = await asyncio.gather(*(
+                fetch_team_players(team, league_id, season_year, semaphore, client, force)
+                for team in teams
+            ))
+
+            # Pages identical to the last stored ones have nothing new to write
+            changed_pages = [
+                (team.team_id, key, body_hash, players_data)
+                for team, pages in results
+                for key, body_hash, players_data in pages
+                if force or stored_page_hashes.get(key) != body_hash
+            ]
+
+            # Check which of the returned players are stored, in one query per season
+            player_ids = {
+                player_data.get("player", {}).get("id")
+                for _, _, _, players_data in changed_pages
+                for player_data in players_data
+            }
+            player_ids.discard(None)
+            known_player_ids = set(await db.scalars(
+                select(models.Player.player_id).where(models.Player.player_id.in_(player_ids))
+            )) if player_ids else set()
+
+            # One row per player and team, upserted together once all teams are read
+            rows = {}
+            page_hashes = {}
+            for team_id, key, body_hash, players_data in changed_pages:
+                page_complete = True
+
+                for player_data in players_data:
+                    player_info = player_data.get("player", {})
+                    statistics_list = player_data.get("statistics", [])
+                    player_id = player_info.get("id")
+
+                    if not player_id:
+                        logging.warning(f"Missing player ID for player data: {player_info}")
+                        continue
+
+                    if player_id not in known_player_ids:
+                        logging.warning(f"Player {player_info.get('name')} (ID: {player_id}) not found in DB.")
+                        page_complete = False
+                        continue
+
+                    for stats_data in statistics_list:
+                        if (stats_data.get("league", {}).get("id") != league_id or
+                                stats_data.get("league", {}).get("season") != season_year):
+                            continue
+
+                        row = {
+                            'player_id': player_id,
+                            'team_id': team_id,
+                            'league_id': league_id,
+                            'season_year': season_year,
                         }
+                        for column, section, source in PLAYER_STATISTICS_FIELDS:
+                            row[column] = stats_data.get(section, {}).get(source)
+                        # The API sends these as strings
+                        row['rating'] = float(row['rating']) if row['rating'] else None
+                        row['passes_accuracy'] = int(row['passes_accuracy']) if row['passes_accuracy'] else None
+                        rows[(player_id, team_id)] = row
+
+                # A page with players missing from the DB is retried on the next run
+                if page_complete:
+                    page_hashes[key] = body_hash
 
-                        response = await client.get(url, headers=headers, params=params)
-                        if response.status_code != 200:
-                            logging.error(f"API Error for team {team.name} (ID: {team_id}): {response.status_code} - {response.text}")
-                            break
-
-                        try:
-                            data = response.json()
-                        except ValueError as e:
-                            logging.error(f"JSON decoding error for team {team.name} (ID: {team_id}): {e}")
-                            break
-
-                        stats_response = data.get("response", [])
-
-                        for player_data in stats_response:
-                            player_info = player_data.get("player", {})
-                            statistics_list = player_data.get("statistics", [])
-                            player_id = player_info.get("id")
-
-                            if not player_id:
-                                logging.warning(f"Missing player ID for player data: {player_info}")
-                                continue
-
-                            # Fetch Player
-                            player = await db.get(models.Player, player_id)
-                            if not player:
-                                logging.warning(f"Player {player_info.get('name')} (ID: {player_id}) not found in DB.")
-                                continue
-
-                            for stats_data in statistics_list:
-                                if (stats_data.get("league", {}).get("id") != league_id or
-                                        stats_data.get("league", {}).get("season") != season_year):
-                                    continue
-
-                                game_stats = stats_data.get("games", {})
-                                subs_stats = stats_data.get("substitutes", {})
-                                shots_stats = stats_data.get("shots", {})
-                                goals_stats = stats_data.get("goals", {})
-                                passes_stats = stats_data.get("passes", {})
-                                tackles_stats = stats_data.get("tackles", {})
-                                duels_stats = stats_data.get("duels", {})
-                                dribbles_stats = stats_data.get("dribbles", {})
-                                fouls_stats = stats_data.get("fouls", {})
-                                cards_stats = stats_data.get("cards", {})
-                                penalty_stats = stats_data.get("penalty", {})
-
-                                # Check if PlayerStatistics already exists
-                                existing_stat_result = await db.execute(
-                                    select(models.PlayerStatistics).filter(
-                                        models.PlayerStatistics.player_id == player_id,
-                                        models.PlayerStatistics.team_id == team_id,
-                                        models.PlayerStatistics.league_id == league_id,
-                                        models.PlayerStatistics.season_year == season_year
-                                    )
-                                )
-                                existing_stat = existing_stat_result.scalar_one_or_none()
-
-                                if not existing_stat:
-                                    # Create new PlayerStatistics
-                                    player_stat = models.PlayerStatistics(
-                                        player_id=player_id,
-                                        team_id=team_id,
-                                        league_id=league_id,
-                                        season_year=season_year,
-                                        appearances=game_stats.get("appearences"),
-                                        lineups=game_stats.get("lineups"),
-                                        minutes=game_stats.get("minutes"),
-                                        number=game_stats.get("number"),
-                                        position=game_stats.get("position"),
-                                        rating=float(game_stats.get("rating")) if game_stats.get("rating") else None,
-                                        captain=game_stats.get("captain"),
-                                        subs_in=subs_stats.get("in"),
-                                        subs_out=subs_stats.get("out"),
-                                        subs_bench=subs_stats.get("bench"),
-                                        shots_total=shots_stats.get("total"),
-                                        shots_on=shots_stats.get("on"),
-                                        goals_total=goals_stats.get("total"),
-                                        goals_conceded=goals_stats.get("conceded"),
-                                        goals_assists=goals_stats.get("assists"),
-                                        goals_saves=goals_stats.get("saves"),
-                                        passes_total=passes_stats.get("total"),
-                                        passes_key=passes_stats.get("key"),
-                                        passes_accuracy=int(passes_stats.get("accuracy")) if passes_stats.get("accuracy") else None,
-                                        tackles_total=tackles_stats.get("total"),
-                                        tackles_blocks=tackles_stats.get("blocks"),
-                                        tackles_interceptions=tackles_stats.get("interceptions"),
-                                        duels_total=duels_stats.get("total"),
-                                        duels_won=duels_stats.get("won"),
-                                        dribbles_attempts=dribbles_stats.get("attempts"),
-                                        dribbles_success=dribbles_stats.get("success"),
-                                        dribbles_past=dribbles_stats.get("past"),
-                                        fouls_drawn=fouls_stats.get("drawn"),
-                                        fouls_committed=fouls_stats.get("committed"),
-                                        cards_yellow=cards_stats.get("yellow"),
-                                        cards_yellowred=cards_stats.get("yellowred"),
-                                        cards_red=cards_stats.get("red"),
-                                        penalty_won=penalty_stats.get("won"),
-                                        penalty_committed=penalty_stats.get("commited"),
-                                        penalty_scored=penalty_stats.get("scored"),
-                                        penalty_missed=penalty_stats.get("missed"),
-                                        penalty_saved=penalty_stats.get("saved")
-                                    )
-                                    db.add(player_stat)
-                                    try:
-                                        await db.commit()
-                                        await db.refresh(player_stat)
-                                        logging.info(f"Statistics for player {player.name} (ID: {player_id}) added.")
-                                    except IntegrityError as ie:
-                                        await db.rollback()
-                                        logging.error(f"IntegrityError while adding statistics for player {player.name} (ID: {player_id}): {ie}")
-                                else:
-                                    # Update existing PlayerStatistics
-                                    fields_to_update = {
-                                        'appearances': game_stats.get("appearences"),
-                                        'lineups': game_stats.get("lineups"),
-                                        'minutes': game_stats.get("minutes"),
-                                        'number': game_stats.get("number"),
-                                        'position': game_stats.get("position"),
-                                        'rating': float(game_stats.get("rating")) if game_stats.get("rating") else None,
-                                        'captain': game_stats.get("captain"),
-                                        'subs_in': subs_stats.get("in"),
-                                        'subs_out': subs_stats.get("out"),
-                                        'subs_bench': subs_stats.get("bench"),
-                                        'shots_total': shots_stats.get("total"),
-                                        'shots_on': shots_stats.get("on"),
-                                        'goals_total': goals_stats.get("total"),
-                                        'goals_conceded': goals_stats.get("conceded"),
-                                        'goals_assists': goals_stats.get("assists"),
-                                        'goals_saves': goals_stats.get("saves"),
-                                        'passes_total': passes_stats.get("total"),
-                                        'passes_key': passes_stats.get("key"),
-                                        'passes_accuracy': int(passes_stats.get("accuracy")) if passes_stats.get("accuracy") else None,
-                                        'tackles_total': tackles_stats.get("total"),
-                                        'tackles_blocks': tackles_stats.get("blocks"),
-                                        'tackles_interceptions': tackles_stats.get("interceptions"),
-                                        'duels_total': duels_stats.get("total"),
-                                        'duels_won': duels_stats.get("won"),
-                                        'dribbles_attempts': dribbles_stats.get("attempts"),
-                                        'dribbles_success': dribbles_stats.get("success"),
-                                        'dribbles_past': dribbles_stats.get("past"),
-                                        'fouls_drawn': fouls_stats.get("drawn"),
-                                        'fouls_committed': fouls_stats.get("committed"),
-                                        'cards_yellow': cards_stats.get("yellow"),
-                                        'cards_yellowred': cards_stats.get("yellowred"),
-                                        'cards_red': cards_stats.get("red"),
-                                        'penalty_won': penalty_stats.get("won"),
-                                        'penalty_committed': penalty_stats.get("commited"),
-                                        'penalty_scored': penalty_stats.get("scored"),
-                                        'penalty_missed': penalty_stats.get("missed"),
-                                        'penalty_saved': penalty_stats.get("saved")
-                                    }
-
-                                    for field, value in fields_to_update.items():
-                                        setattr(existing_stat, field, value)
-                                    
-                                    try:
-                                        await db.commit()
-                                        logging.info(f"Statistics for player {player.name} (ID: {player_id}) updated.")
-                                    except IntegrityError as ie:
-                                        await db.rollback()
-                                        logging.error(f"IntegrityError while updating statistics for player {player.name} (ID: {player_id}): {ie}")
-
-                        # Handle pagination
-                        paging = data.get("paging", {})
-                        total_pages = paging.get("total", 1)
-                        current_page = paging.get("current", 1)
-                        if current_page >= total_pages:
-                            break
-                        else:
-                            page += 1
-                            await asyncio.sleep(0.5)
+            if not rows:
+                logging.info(f"No changed player statistics for league ID {league_id} season {season_year}.")
+                stored_page_hashes.update(page_hashes)
+            elif await store_player_statistics(list(rows.values()), db):
+                logging.info(f"Statistics for {len(rows)} players of league ID {league_id} season {season_year} stored.")
+                stored_page_hashes.update(page_hashes)
 
         return {"message": "Player statistics fetched and stored successfully"}
 
     except Exception as e:
         logging.error(f"An error occurred: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
+
+
+async def fetch_team_players(team, league_id, season_year, semaphore, client, force=False):
+    # Returns (cache key, body hash, player entries) for each page fetched for the team
+    first_page = await fetch_cached_players_page(team, league_id, season_year, 1, semaphore, client, force)
+    if first_page is None:
+        return team, []
+
+    # Once the page count is known, the remaining pages are fetched concurrently
+    total_pages = first_page[1].get("paging", {}).get("total", 1)
+    results = [first_page] + await asyncio.gather(*(
+        fetch_cached_players_page(team, league_id, season_year, page, semaphore, client, force)
+        for page in range(2, total_pages + 1)
+    ))
+
+    pages = []
+    for page, result in enumerate(results, start=1):
+        if result is not None:
+            body_hash, data = result
+            key = players_page_key(team.team_id, league_id, season_year, page)
+            pages.append((key, body_hash, data.get("response", [])))
+    return team, pages
+
+
+def players_page_key(team_id, league_id, season_year, page):
+    return ('players', team_id, league_id, season_year, page)
+
+
+async def fetch_cached_players_page(team, league_id, season_year, page, semaphore, client, force=False):
+    key = players_page_key(team.team_id, league_id, season_year, page)
+    fetch = functools.partial(fetch_players_page, team, league_id, season_year, page, client)
+    async with semaphore:
+        return await cached_get(api_response_cache, key, PLAYER_PAGE_TTL, fetch, force=force)
+
+
+async def fetch_players_page(team, league_id, season_year, page, client):
+    # Returns the hash of the raw body along with the parsed page
+    team_id = team.team_id
+    params = {
+        'team': team_id,
+        'season': season_year,
+        'league': league_id,
+        'page': page
+    }
+
+    try:
+        response = await api_get(client, PLAYERS_URL, params=params)
+    except httpx.RequestError as e:
+        logging.error(f"Request error for team {team.name} (ID: {team_id}): {e}")
+        return None
+    if response.status_code != 200:
+        logging.error(f"API Error for team {team.name} (ID: {team_id}): {response.status_code} - {response.text}")
+        return None
+
+    try:
+        return hashlib.blake2b(response.content, digest_size=16).digest(), parse_response(response)
+    except ValueError as e:
+        logging.error(f"JSON decoding error for team {team.name} (ID: {team_id}): {e}")
+        return None
+
+
+async def store_player_statistics(rows, db):
+    # One set-based upsert per season instead of a SELECT and commit per player
+    try:
+        if len(rows) > PLAYER_STATISTICS_COPY_THRESHOLD:
+            await crud.copy_upsert_records(
+                db, models.PlayerStatistics.__tablename__, PLAYER_STATISTICS_COLUMNS,
+                [tuple(row[column] for column in PLAYER_STATISTICS_COLUMNS) for row in rows],
+                conflict_columns=PLAYER_STATISTICS_KEY,
+                update_columns=PLAYER_STATISTICS_COLUMNS[len(PLAYER_STATISTICS_KEY):]
+            )
+        else:
+            await db.execute(PLAYER_STATISTICS_UPSERT, rows)
+        await db.commit()
+        return True
+    except Exception as e:
+        await db.rollback()
+        logging.error(f"Error storing statistics for league ID {rows[0]['league_id']} season {rows[0]['season_year']}: {e}", exc_info=True)
+        return False
@@ -1,14 +1,22 @@
 # app/routers/ingestion/predictions.py
 
+import asyncio
 import logging
 import os
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import select
 import httpx
 
-from app.database import get_db
+from app.database import engine, get_db
+from app.http_clients import get_api_client
 from app import models
+from app.routers.ingestion.ingest_fixtures_data import (
+    FIXTURE_ENDPOINTS,
+    UNCHANGED,
+    fetch_fixture_endpoint,
+    store_prediction_for_fixture,
+)
 
 router = APIRouter(
     prefix="/predictions",
@@ -17,11 +25,16 @@ router = APIRouter(
 
 API_FOOTBALL_KEY = os.getenv("API_FOOTBALL_KEY")
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+PREDICTION_FETCH_CONCURRENCY = 10
+FIXTURE_ID_BATCH_SIZE = 1000
+
 @router.post("/", response_model=dict)
-async def fetch_and_store_predictions(db: AsyncSession = Depends(get_db)):
+async def fetch_and_store_predictions(
+    db: AsyncSession = Depends(get_db),
+    client: httpx.AsyncClient = Depends(get_api_client)
+):
     logger.info("Starting the predictions ingestion process.")
     try:
         # Validate API key
@@ -29,98 +42,50 @@ async def fetch_and_store_predictions(db: AsyncSession = Depends(get_db)):
             logger.error("API_FOOTBALL_KEY environment variable is not set.")
             raise HTTPException(status_code=500, detail="API key not configured.")
 
-        headers = {
-            'x-apisports-key': API_FOOTBALL_KEY,
-            'Accept': 'application/json'
-        }
+        fixtures_seen = 0
+        predictions_processed = 0
+        predictions_skipped = 0
+        semaphore = asyncio.Semaphore(PREDICTION_FETCH_CONCURRENCY)
 
-        async with httpx.AsyncClient() as client:
-            # Fetch all fixtures 
-            fixtures_result = await db.execute(
-                select(models.Fixture.fixture_id)
+        # Stream fixture ids through a server-side cursor in batches. The cursor gets
+        # its own connection, as the session commits after every prediction it stores.
+        async with engine.connect() as conn:
+            result = await conn.stream(
+                select(models.Fixture.fixture_id).execution_options(yield_per=FIXTURE_ID_BATCH_SIZE)
             )
-            fixture_ids = [fixture_id for (fixture_id,) in fixtures_result.fetchall()]
-
-            if not fixture_ids:
-                logger.info("No fixtures found.")
-                return {"message": "No fixtures found."}
-
-            predictions_processed = 0
-
-            for fixture_id in fixture_ids:
-                logger.info(f"Fetching prediction for fixture ID: {fixture_id}")
-
-                params = {
-                    'fixture': fixture_id
-                }
-
-                response = await client.get(
-                    "https://v3.football.api-sports.io/predictions",
-                    headers=headers,
-                    params=params
-                )
-
-                if response.status_code != 200:
-                    logger.error(f"Failed to fetch prediction for fixture {fixture_id}: {response.text}")
-                    continue
-
-                data = response.json()
-                predictions_response = data.get("response", [])
-
-                if not predictions_response:
-                    logger.info(f"No prediction available for fixture {fixture_id}.")
-                    continue
-
-                prediction_data = predictions_response[0]
-
-                # Extract prediction details
-                predictions = prediction_data.get("predictions", {})
-                winner = predictions.get("winner", {})
-                win_or_draw = predictions.get("win_or_draw")
-                under_over = predictions.get("under_over")
-                goals = predictions.get("goals", {})
-                advice = predictions.get("advice")
-                percent = predictions.get("percent", {})
-                comparison = prediction_data.get("comparison", {})
-
-                # Check if prediction already exists
-                existing_prediction = await db.get(models.Prediction, fixture_id)
-
-                if existing_prediction:
-                    # Update existing prediction
-                    existing_prediction.winner_team_id = winner.get("id")
-                    existing_prediction.win_or_draw = win_or_draw
-                    existing_prediction.under_over = under_over
-                    existing_prediction.goals_home = goals.get("home")
-                    existing_prediction.goals_away = goals.get("away")
-                    existing_prediction.advice = advice
-                    existing_prediction.percent_home = percent.get("home")
-                    existing_prediction.percent_draw = percent.get("draw")
-                    existing_prediction.percent_away = percent.get("away")
-                    existing_prediction.comparison = comparison
-                else:
-                    # Store new prediction
-                    prediction = models.Prediction(
-                        fixture_id=fixture_id,
-                        winner_team_id=winner.get("id"),
-                        win_or_draw=win_or_draw,
-                        under_over=under_over,
-                        goals_home=goals.get("home"),
-                        goals_away=goals.get("away"),
-                        advice=advice,
-                        percent_home=percent.get("home"),
-                        percent_draw=percent.get("draw"),
-                        percent_away=percent.get("away"),
-                        comparison=comparison
-                    )
-                    db.add(prediction)
-
-                await db.commit()
-                predictions_processed += 1
-
-            logger.info(f"Finished fetching and storing predictions. Total predictions processed: {predictions_processed}")
-            return {"message": "Predictions fetched and stored successfully", "processed": predictions_processed}
+            async for partition in result.partitions():
+                fixtures_seen += len(partition)
+
+                # Fetch the batch concurrently and store each prediction as soon as it
+                # arrives; only this coroutine uses the session, so writes stay serial
+                fetches = [fetch_prediction(fixture_id, semaphore, client) for (fixture_id,) in partition]
+                for fetch in asyncio.as_completed(fetches):
+                    fixture_id, predictions_response = await fetch
+                    if predictions_response is None or predictions_response is UNCHANGED:
+                        predictions_skipped += 1
+                        continue
+
+                    if await store_prediction_for_fixture(fixture_id, predictions_response, db):
+                        predictions_processed += 1
+                    else:
+                        predictions_skipped += 1
+
+        if not fixtures_seen:
+            logger.info("No fixtures found.")
+            return {"message": "No fixtures found."}
+
+        logger.info(
+            "Finished fetching and storing predictions. fixtures=%d processed=%d skipped=%d",
+            fixtures_seen, predictions_processed, predictions_skipped
+        )
+        return {"message": "Predictions fetched and stored successfully", "processed": predictions_processed}
 
     except Exception as e:
         logger.error(f"An error occurred during predictions ingestion: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
+
+
+async def fetch_prediction(fixture_id, semaphore, client):
+    async with semaphore:
+        logger.debug("Fetching prediction for fixture ID: %s", fixture_id)
+        return fixture_id, await fetch_fixture_endpoint(FIXTURE_ENDPOINTS['predictions'], fixture_id, client)
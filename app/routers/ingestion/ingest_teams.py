@@ -1,14 +1,18 @@
 # app/routers/ingestion/ingest_teams.py
 
+import asyncio
 import logging
 import os
 import httpx
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import joinedload
+from app.cache import fixtures_response_cache
 from app.database import get_db
-from app import models
+from app.http_clients import API_FOOTBALL_BASE_URL, api_get, get_api_client, parse_response
+from app import crud, models
 
 router = APIRouter(
     prefix="/teams",
@@ -17,11 +21,27 @@ router = APIRouter(
 
 API_FOOTBALL_KEY = os.getenv("API_FOOTBALL_KEY")
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+TEAMS_URL = httpx.URL(f"{API_FOOTBALL_BASE_URL}/teams")
+
+TEAM_FETCH_CONCURRENCY = 10
+
+# A team or association stored meanwhile by another run is skipped, not an error
+TEAM_INSERT = pg_insert(models.Team).on_conflict_do_nothing(index_elements=[models.Team.team_id])
+TEAM_LEAGUE_INSERT = pg_insert(models.TeamLeague).on_conflict_do_nothing(constraint='uix_team_league_season')
+
+TEAM_COLUMNS = ('team_id', 'name', 'code', 'country', 'founded', 'national', 'logo')
+TEAM_LEAGUE_COLUMNS = ('team_id', 'league_id', 'season_year')
+
+# Above this many rows, load through COPY instead of a multi-row INSERT
+TEAM_COPY_THRESHOLD = 100
+
 @router.post("/", response_model=dict)
-async def fetch_and_store_teams(db: AsyncSession = Depends(get_db)):
+async def fetch_and_store_teams(
+    db: AsyncSession = Depends(get_db),
+    client: httpx.AsyncClient = Depends(get_api_client)
+):
     try:
         # Fetch all current seasons with their associated leagues
         seasons_result = await db.execute(
@@ -39,110 +59,132 @@ async def fetch_and_store_teams(db: AsyncSession = Depends(get_db)):
             logger.error("API_FOOTBALL_KEY environment variable is not set.")
             raise HTTPException(status_code=500, detail="API key not configured.")
 
-        headers = {
-            'x-apisports-key': API_FOOTBALL_KEY,
-            'Accept': 'application/json'
-        }
-
-        async with httpx.AsyncClient() as client:
-            for season in seasons:
-                league_id = season.league_id
-                season_year = season.year
-                league_name = season.league.name
-
-
-                url = "https://v3.football.api-sports.io/teams"
-                params = {
-                    'league': league_id,
-                    'season': season_year
-                }
-
-                logger.info(f"Fetching team data from {url} with params {params}")
-                response = await client.get(url, headers=headers, params=params)
-
-                if response.status_code != 200:
-                    logger.error(f"API Error for league {league_name} ({league_id}): {response.status_code} - {response.text}")
+        # Fetch every season's teams concurrently, then store them one season at a time
+        semaphore = asyncio.Semaphore(TEAM_FETCH_CONCURRENCY)
+        results = await asyncio.gather(*(fetch_season_teams(season, semaphore, client) for season in seasons))
+
+        all_teams = []
+        all_associations = []
+        for season, data in results:
+            if data is None:
+                continue
+
+            league_id = season.league_id
+            season_year = season.year
+            league_name = season.league.name
+
+            teams = data.get("response", [])
+            logger.info(f"Fetched {len(teams)} teams for {league_name} in season {season_year}.")
+
+            total_fetched = len(teams)
+            total_skipped = 0  # can be used for additional tracking
+            teams_to_add = []
+            associations_to_add = []
+
+            # Load the stored teams and this season's associations once per season
+            team_ids = [item.get("team", {}).get("id") for item in teams]
+            existing_team_ids = set(await db.scalars(
+                select(models.Team.team_id).where(models.Team.team_id.in_(team_ids))
+            ))
+            associated_team_ids = set(await db.scalars(
+                select(models.TeamLeague.team_id).where(
+                    models.TeamLeague.league_id == league_id,
+                    models.TeamLeague.season_year == season_year,
+                    models.TeamLeague.team_id.in_(team_ids)
+                )
+            ))
+
+            for item in teams:
+                team_info = item.get("team", {})
+
+                # Extract team details
+                team_id = team_info.get("id")
+                team_name = team_info.get("name")
+
+                if not team_id or not team_name:
+                    logger.warning("Team information incomplete; skipping.")
+                    total_skipped += 1
                     continue
 
-                data = response.json()
-                teams = data.get("response", [])
-                logger.info(f"Fetched {len(teams)} teams for {league_name} in season {season_year}.")
-
-                total_fetched = len(teams)
-                total_skipped = 0  # can be used for additional tracking
-                teams_to_add = []
-                associations_to_add = []
-
-                for item in teams:
-                    team_info = item.get("team", {})
-
-                    # Extract team details
-                    team_id = team_info.get("id")
-                    team_name = team_info.get("name")
-
-                    if not team_id or not team_name:
-                        logger.warning("Team information incomplete; skipping.")
-                        total_skipped += 1
-                        continue
-
-                    # Check if the team exists; else create it
-                    existing_team_result = await db.execute(
-                        select(models.Team).filter(models.Team.team_id == team_id)
-                    )
-                    team = existing_team_result.scalar_one_or_none()
-
-                    if not team:
-                        team = models.Team(
-                            team_id=team_id,
-                            name=team_name,
-                            code=team_info.get("code"),
-                            country=team_info.get("country"),
-                            founded=team_info.get("founded"),
-                            national=team_info.get("national"),
-                            logo=team_info.get("logo")
-                        )
-                        teams_to_add.append(team)
-                        logger.info(f"New team added: {team_name} (ID: {team_id})")
-
-                    # Create association with the league and season
-                    association = models.TeamLeague(
-                        team=team,
-                        league_id=league_id,
-                        season_year=season_year
-                    )
-
-                    # Check if the association already exists
-                    existing_association_result = await db.execute(
-                        select(models.TeamLeague).filter(
-                            models.TeamLeague.team_id == team_id,
-                            models.TeamLeague.league_id == league_id,
-                            models.TeamLeague.season_year == season_year
-                        )
-                    )
-                    existing_assoc = existing_association_result.scalar_one_or_none()
-
-                    if not existing_assoc:
-                        associations_to_add.append(association)
-                    else:
-                        logger.info(f"Association already exists for team {team_name} (ID: {team_id}), league {league_name}, season {season_year}.")
-
-                # add new teams
-                if teams_to_add:
-                    db.add_all(teams_to_add)
-                    await db.commit()
-                    for t in teams_to_add:
-                        logger.info(f"Team {t.name} (ID: {t.team_id}) added.")
-
-                # add new associations
-                if associations_to_add:
-                    db.add_all(associations_to_add)
-                    await db.commit()
-                    for assoc in associations_to_add:
-                        logger.info(f"Association added: Team ID {assoc.team_id}, League ID {assoc.league_id}, Season {assoc.season_year}.")
-
-                logger.info(f"Fetched {total_fetched} teams, skipped {total_skipped} teams for {league_name}.")
+                # Check if the team exists; else create it
+                if team_id not in existing_team_ids:
+                    teams_to_add.append({
+                        'team_id': team_id,
+                        'name': team_name,
+                        'code': team_info.get("code"),
+                        'country': team_info.get("country"),
+                        'founded': team_info.get("founded"),
+                        'national': team_info.get("national"),
+                        'logo': team_info.get("logo")
+                    })
+                    existing_team_ids.add(team_id)
+
+                # Create association with the league and season unless it already exists
+                if team_id not in associated_team_ids:
+                    associations_to_add.append({
+                        'team_id': team_id,
+                        'league_id': league_id,
+                        'season_year': season_year
+                    })
+                    associated_team_ids.add(team_id)
+
+            all_teams.extend(teams_to_add)
+            all_associations.extend(associations_to_add)
+
+            logger.info(
+                "league=%s season=%s fetched=%d teams_added=%d associations_added=%d skipped=%d",
+                league_id, season_year, total_fetched, len(teams_to_add), len(associations_to_add), total_skipped
+            )
+
+        # Add new teams of all seasons, then their associations, in one transaction
+        if all_teams:
+            await insert_rows(db, TEAM_INSERT, TEAM_COLUMNS, all_teams, ('team_id',))
+        if all_associations:
+            await insert_rows(db, TEAM_LEAGUE_INSERT, TEAM_LEAGUE_COLUMNS, all_associations, TEAM_LEAGUE_COLUMNS)
+        if all_teams or all_associations:
+            await db.commit()
+            crud.season_teams_cache.clear()
+            fixtures_response_cache.clear()
 
         return {"message": "Teams fetched and stored successfully"}
     except Exception as e:
         logger.error(f"An unexpected error occurred: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
+
+
+async def insert_rows(db, statement, columns, rows, conflict_columns):
+    if len(rows) > TEAM_COPY_THRESHOLD:
+        await crud.copy_upsert_records(
+            db, statement.table.name, columns,
+            [tuple(row[column] for column in columns) for row in rows],
+            conflict_columns=conflict_columns,
+            update_columns=()
+        )
+    else:
+        await db.execute(statement, rows)
+
+
+async def fetch_season_teams(season, semaphore, client):
+    league_name = season.league.name
+    params = {
+        'league': season.league_id,
+        'season': season.year
+    }
+
+    logger.info(f"Fetching team data from {TEAMS_URL} with params {params}")
+    async with semaphore:
+        try:
+            response = await api_get(client, TEAMS_URL, params=params)
+        except httpx.RequestError as e:
+            logger.error(f"Request error for league {league_name} ({season.league_id}): {e}")
+            return season, None
+
+    if response.status_code != 200:
+        logger.error(f"API Error for league {league_name} ({season.league_id}): {response.status_code} - {response.text}")
+        return season, None
+
+    try:
+        return season, parse_response(response)
+    except ValueError as e:
+        logger.error(f"JSON decoding error for league {league_name} ({season.league_id}): {e}")
+        return season, None
@@ -1,11 +1,14 @@
+import asyncio
 from datetime import date
 import logging
 from typing import List, Dict, Any, Optional
 from fastapi import APIRouter, Depends, HTTPException, Path, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import Date, cast, or_, select
-from sqlalchemy.orm import selectinload
-from app.database import get_db
+from sqlalchemy import Date, cast, func, literal_column, or_, select
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import noload, selectinload
+from app.cache import cached_get, fixtures_response_cache
+from app.database import SessionLocal, get_db
 from app import models, schemas
 
 router = APIRouter(
@@ -15,6 +18,53 @@ router = APIRouter(
 
 logger = logging.getLogger(__name__)
 
+FIXTURES_CACHE_TTL = 300
+
+# The fixture's UTC day, written to match the ix_fixture_league_season_day index
+FIXTURE_DAY = cast(func.timezone(literal_column("'UTC'"), models.Fixture.date), Date)
+
+EMPTY_JSONB_ARRAY = literal_column("'[]'::jsonb", JSONB)
+
+def jsonb_list(*args):
+    # jsonb_agg yields NULL for no rows; the schemas expect an empty list
+    return func.coalesce(func.jsonb_agg(func.jsonb_build_object(*args, type_=JSONB)), EMPTY_JSONB_ARRAY)
+
+# A fixture's odds shaped as FixtureOddsSchema by Postgres itself, as one
+# correlated subquery instead of a selectinload query per relationship level
+ODD_VALUES_JSON = select(
+    jsonb_list('id', models.OddValue.id, 'value', models.OddValue.value, 'odd', models.OddValue.odd)
+).where(models.OddValue.bet_id == models.Bet.id).scalar_subquery()
+
+BETS_JSON = select(
+    jsonb_list(
+        'id', models.Bet.id,
+        'bet_type', func.jsonb_build_object('id', models.BetType.id, 'name', models.BetType.name),
+        'odd_values', ODD_VALUES_JSON
+    )
+).join(models.BetType, models.Bet.bet_type_id == models.BetType.id).where(
+    models.Bet.fixture_bookmaker_id == models.FixtureBookmaker.id
+).scalar_subquery()
+
+FIXTURE_BOOKMAKERS_JSON = select(
+    jsonb_list(
+        'id', models.FixtureBookmaker.id,
+        'bookmaker', func.jsonb_build_object('id', models.Bookmaker.id, 'name', models.Bookmaker.name),
+        'bets', BETS_JSON
+    )
+).join(models.Bookmaker, models.FixtureBookmaker.bookmaker_id == models.Bookmaker.id).where(
+    models.FixtureBookmaker.fixture_odds_id == models.FixtureOdds.id
+).scalar_subquery()
+
+FIXTURE_ODDS_JSON = select(
+    func.jsonb_build_object(
+        'id', models.FixtureOdds.id,
+        'update_time', models.FixtureOdds.update_time,
+        'fixture_id', models.FixtureOdds.fixture_id,
+        'fixture_bookmakers', FIXTURE_BOOKMAKERS_JSON,
+        type_=JSONB
+    )
+).where(models.FixtureOdds.fixture_id == models.Fixture.fixture_id).scalar_subquery()
+
 @router.get("/", response_model=List[schemas.FixtureBase])
 async def get_fixtures(
     league_id: int = Query(...),
@@ -25,45 +75,44 @@ async def get_fixtures(
 ):
     logger.info(f"Fetching fixtures with league_id={league_id}, season_year={season_year}, date_from={date_from}, date_to={date_to}")
     try:
-        query = select(models.Fixture).where(
-            models.Fixture.league_id == league_id,
-            models.Fixture.season_year == season_year
-        ).options(
-            selectinload(models.Fixture.home_team),
-            selectinload(models.Fixture.away_team),
-            selectinload(models.Fixture.league),
-            selectinload(models.Fixture.venue),
-            selectinload(models.Fixture.prediction),
-            selectinload(models.Fixture.match_events),
-            selectinload(models.Fixture.match_statistics),
-            selectinload(models.Fixture.odds)
-                .selectinload(models.FixtureOdds.fixture_bookmakers)
-                .selectinload(models.FixtureBookmaker.bookmaker),
-            selectinload(models.Fixture.odds)
-                .selectinload(models.FixtureOdds.fixture_bookmakers)
-                .selectinload(models.FixtureBookmaker.bets)
-                .selectinload(models.Bet.bet_type),
-            selectinload(models.Fixture.odds)
-                .selectinload(models.FixtureOdds.fixture_bookmakers)
-                .selectinload(models.FixtureBookmaker.bets)
-                .selectinload(models.Bet.odd_values),
+        # Served from memory for a few minutes; ingestion clears the cache when it writes
+        return await cached_get(
+            fixtures_response_cache,
+            (league_id, season_year, date_from, date_to),
+            FIXTURES_CACHE_TTL,
+            lambda: load_fixtures(db, league_id, season_year, date_from, date_to)
         )
-
-        if date_from and date_to and date_from == date_to:
-            query = query.where(cast(models.Fixture.date, Date) == date_from)
-        else:
-            if date_from:
-                query = query.where(cast(models.Fixture.date, Date) >= date_from)
-            if date_to:
-                query = query.where(cast(models.Fixture.date, Date) <= date_to)
-
-        result = await db.execute(query)
-        fixtures = result.scalars().all()
-        return fixtures
     except Exception as e:
         logger.error(f"Error fetching fixtures: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
+async def load_fixtures(db: AsyncSession, league_id: int, season_year: int, date_from: Optional[date], date_to: Optional[date]) -> List[schemas.FixtureBase]:
+    # Only the teams and odds are part of FixtureBase; the odds come back as JSON
+    query = select(models.Fixture, FIXTURE_ODDS_JSON.label('odds')).where(
+        models.Fixture.league_id == league_id,
+        models.Fixture.season_year == season_year
+    ).options(
+        selectinload(models.Fixture.home_team),
+        selectinload(models.Fixture.away_team),
+        noload(models.Fixture.odds),
+    )
+
+    if date_from and date_to and date_from == date_to:
+        query = query.where(FIXTURE_DAY == date_from)
+    else:
+        if date_from:
+            query = query.where(FIXTURE_DAY >= date_from)
+        if date_to:
+            query = query.where(FIXTURE_DAY <= date_to)
+
+    result = await db.execute(query)
+    return [
+        schemas.FixtureBase.model_validate(fixture).model_copy(
+            update={'odds': schemas.FixtureOddsSchema.model_validate(odds) if odds else None}
+        )
+        for fixture, odds in result
+    ]
+
 @router.get("/{fixture_id}/detailed", response_model=schemas.FixtureDetailedResponse)
 async def get_detailed_fixture(
     fixture_id: int = Path(...),
@@ -123,14 +172,25 @@ async def get_detailed_fixture(
     if fixture.prediction:
         detailed_fixture_data['prediction'] = schemas.PredictionSchema.model_validate(fixture.prediction, from_attributes=True).model_dump()
 
-    # Additional data: h2h, recent form, team stats, top players
-    h2h_stats = await get_h2h_stats(db, fixture.home_team_id, fixture.away_team_id)
-    home_recent_form = await get_team_recent_form(db, fixture.home_team_id)
-    away_recent_form = await get_team_recent_form(db, fixture.away_team_id)
-    home_team_stats = await get_team_statistics(db, fixture.home_team_id, fixture.season_year, fixture.league_id)
-    away_team_stats = await get_team_statistics(db, fixture.away_team_id, fixture.season_year, fixture.league_id)
-    home_top_players = await get_top_players(db, fixture.home_team_id, fixture.season_year)
-    away_top_players = await get_top_players(db, fixture.away_team_id, fixture.season_year)
+    # Additional data: h2h, recent form, team stats, top players. The reads are
+    # independent, so they run concurrently, each on its own session.
+    (
+        h2h_stats,
+        home_recent_form,
+        away_recent_form,
+        home_team_stats,
+        away_team_stats,
+        home_top_players,
+        away_top_players,
+    ) = await asyncio.gather(
+        with_session(get_h2h_stats, fixture.home_team_id, fixture.away_team_id),
+        with_session(get_team_recent_form, fixture.home_team_id),
+        with_session(get_team_recent_form, fixture.away_team_id),
+        with_session(get_team_statistics, fixture.home_team_id, fixture.season_year, fixture.league_id),
+        with_session(get_team_statistics, fixture.away_team_id, fixture.season_year, fixture.league_id),
+        with_session(get_top_players, fixture.home_team_id, fixture.season_year),
+        with_session(get_top_players, fixture.away_team_id, fixture.season_year),
+    )
 
     detailed_fixture_data.update({
         'h2h_stats': h2h_stats.model_dump(),
@@ -146,6 +206,11 @@ async def get_detailed_fixture(
     logger.info(f"Returning detailed fixture for fixture_id: {fixture_id}")
     return detailed_fixture_response
 
+async def with_session(query_func, *args):
+    # An AsyncSession can't run queries concurrently, so each gathered read gets its own
+    async with SessionLocal() as session:
+        return await query_func(session, *args)
+
 async def get_h2h_stats(db: AsyncSession, home_team_id: int, away_team_id: int) -> schemas.FixtureH2HStats:
     h2h_query = select(models.Fixture).where(
         or_(
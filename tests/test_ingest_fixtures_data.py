@@ -0,0 +1,202 @@
+# tests/test_ingest_fixtures_data.py
+
+import asyncio
+import time
+import unittest
+from datetime import date
+from types import SimpleNamespace
+from unittest import mock
+
+from fastapi import HTTPException
+
+from tests.fakes import FakeSession
+from app.cache import TTLCache, cached_get, fixtures_response_cache
+from app.routers.ingestion import ingest_fixtures_data
+from app.routers.ingestion.ingest_fixtures_data import (
+    BET_UPSERT,
+    FIXTURE_BOOKMAKER_UPSERT,
+    ODD_VALUE_UPSERT,
+    FINAL_RESPONSE_TTL,
+    LIVE_RESPONSE_TTL,
+    UNCHANGED,
+    final_response_ttl,
+    store_fixture_data_worker,
+    store_odds_for_fixture,
+)
+
+
+def odds_entry(fixture_id, update, bookmaker_id, bet_id, values):
+    return {
+        "fixture": {"id": fixture_id},
+        "update": update,
+        "bookmakers": [
+            {
+                "id": bookmaker_id,
+                "name": f"Bookmaker {bookmaker_id}",
+                "bets": [
+                    {
+                        "id": bet_id,
+                        "name": f"Bet {bet_id}",
+                        "values": [{"value": value, "odd": odd} for value, odd in values],
+                    }
+                ],
+            }
+        ],
+    }
+
+
+class StoreOddsForFixtureTests(unittest.IsolatedAsyncioTestCase):
+    async def test_entries_of_one_fixture_are_merged_before_orphans_are_deleted(self):
+        db = FakeSession()
+        odds_response = [
+            odds_entry(10, "2024-05-01T10:00:00+00:00", 1, 1, [("Home", "1.50"), ("Away", "2.60")]),
+            odds_entry(10, "2024-05-01T11:00:00+00:00", 2, 5, [("Over 2.5", "1.90")]),
+        ]
+
+        self.assertTrue(await store_odds_for_fixture(10, odds_response, db))
+
+        # Both entries' bookmakers and bets go in with one statement per level
+        self.assertEqual(
+            [row['bookmaker_id'] for row in db.params_of(FIXTURE_BOOKMAKER_UPSERT)], [1, 2]
+        )
+        self.assertEqual([row['bet_type_id'] for row in db.params_of(BET_UPSERT)], [1, 5])
+        self.assertEqual(
+            sorted(row['value'] for row in db.params_of(ODD_VALUE_UPSERT)),
+            ["Away", "Home", "Over 2.5"]
+        )
+
+        # Orphans are deleted once, after every level has been written
+        bookmaker_deletes = db.deletes("fixture_bookmakers")
+        bet_deletes = db.deletes("bets")
+        self.assertEqual(len(bookmaker_deletes), 1)
+        self.assertEqual(len(bet_deletes), 1)
+        self.assertGreater(bookmaker_deletes[0], db.index_of(ODD_VALUE_UPSERT))
+        self.assertGreater(bet_deletes[0], db.index_of(ODD_VALUE_UPSERT))
+        self.assertEqual(db.calls[-1][0], "commit")
+
+    async def test_later_entry_wins_for_the_same_bet(self):
+        db = FakeSession()
+        odds_response = [
+            odds_entry(10, "2024-05-01T11:00:00+00:00", 1, 1, [("Home", "1.40")]),
+            odds_entry(10, "2024-05-01T10:00:00+00:00", 1, 1, [("Home", "1.50")]),
+        ]
+
+        self.assertTrue(await store_odds_for_fixture(10, odds_response, db))
+
+        self.assertEqual(len(db.params_of(FIXTURE_BOOKMAKER_UPSERT)), 1)
+        self.assertEqual([row['odd'] for row in db.params_of(ODD_VALUE_UPSERT)], ["1.40"])
+
+    async def test_storing_one_fixture_leaves_the_fixtures_cache_to_the_run(self):
+        fixtures_response_cache.set('fixtures', [], ttl=None)
+        self.addCleanup(fixtures_response_cache.clear)
+        odds_response = [odds_entry(10, "2024-05-01T10:00:00+00:00", 1, 1, [("Home", "1.50")])]
+
+        self.assertTrue(await store_odds_for_fixture(10, odds_response, FakeSession()))
+
+        self.assertIsNotNone(fixtures_response_cache.get('fixtures'))
+
+    async def test_restored_odds_match_ids_to_rows_by_key(self):
+        db = FakeSession()
+        first = [odds_entry(10, "2024-05-01T10:00:00+00:00", 2, 1, [("Home", "1.50")])]
+        self.assertTrue(await store_odds_for_fixture(10, first, db))
+
+        # Bookmaker 1 and its bet are new, so they get higher ids than the stored
+        # bookmaker 2 even though they come first in the payload
+        second = [
+            {
+                "fixture": {"id": 10},
+                "update": "2024-05-01T11:00:00+00:00",
+                "bookmakers": [
+                    odds_entry(10, None, 1, 5, [("Over 2.5", "1.80")])["bookmakers"][0],
+                    odds_entry(10, None, 2, 1, [("Home", "1.45")])["bookmakers"][0],
+                ],
+            }
+        ]
+        self.assertTrue(await store_odds_for_fixture(10, second, db))
+
+        fixture_bookmaker_ids = {key[0]: id_ for key, id_ in db.upserted["fixture_bookmakers"].items()}
+        bet_ids = db.upserted["bets"]
+        odd_value_rows = [params for statement, params in db.calls if statement is ODD_VALUE_UPSERT][-1]
+        odds_by_bet = {(row['bet_id'], row['value']): row['odd'] for row in odd_value_rows}
+        self.assertEqual(odds_by_bet, {
+            (bet_ids[(fixture_bookmaker_ids[1], 5)], "Over 2.5"): "1.80",
+            (bet_ids[(fixture_bookmaker_ids[2], 1)], "Home"): "1.45",
+        })
+
+        bet_rows = [params for statement, params in db.calls if statement is BET_UPSERT][-1]
+        self.assertCountEqual(
+            [(row['fixture_bookmaker_id'], row['bet_type_id']) for row in bet_rows],
+            [(fixture_bookmaker_ids[1], 5), (fixture_bookmaker_ids[2], 1)]
+        )
+
+
+class SeasonSession(FakeSession):
+    async def execute(self, statement, params=None):
+        await super().execute(statement, params)
+        season = SimpleNamespace(start_date=date(2024, 8, 1), end_date=date(2025, 5, 31))
+        return SimpleNamespace(scalar_one_or_none=lambda: season)
+
+
+async def fill_queue_forever(pending, fetched, *args):
+    while True:
+        await fetched.put((1, {}))
+
+
+async def fail_on_first_item(fetched, db, known_ids=None):
+    await fetched.get()
+    raise RuntimeError("connection lost")
+
+
+async def no_reference_ids(db):
+    return {'bookmakers': set(), 'bet_types': set()}
+
+
+class IngestFixturesDataPipelineTests(unittest.IsolatedAsyncioTestCase):
+    async def test_consumer_failure_ends_the_run_instead_of_hanging(self):
+        db = SeasonSession()
+        fixtures_response_cache.set('fixtures', [], ttl=None)
+        with mock.patch.object(ingest_fixtures_data, "feed_fixture_rows", mock.AsyncMock(return_value=1)), \
+                mock.patch.object(ingest_fixtures_data, "fetch_fixture_data_worker", fill_queue_forever), \
+                mock.patch.object(ingest_fixtures_data, "store_fixture_data_worker", fail_on_first_item), \
+                mock.patch.object(ingest_fixtures_data, "load_odds_reference_ids", no_reference_ids):
+            with self.assertRaises(HTTPException) as raised:
+                await asyncio.wait_for(ingest_fixtures_data.ingest_fixtures_data(db, client=None), timeout=5)
+
+        self.assertEqual(raised.exception.detail, "connection lost")
+        self.assertIn(("rollback", None), db.calls)
+        # Anything committed before the failure must not be served stale
+        self.assertIsNone(fixtures_response_cache.get('fixtures'))
+
+
+class StoreFixtureDataWorkerTests(unittest.IsolatedAsyncioTestCase):
+    async def test_unchanged_odds_are_stamped_but_failed_fetches_are_not(self):
+        db = FakeSession()
+        fetched = asyncio.Queue()
+        await fetched.put((5, {'predictions': None, 'odds': UNCHANGED}))
+        await fetched.put(None)
+
+        self.assertEqual(await store_fixture_data_worker(fetched, db), 1)
+
+        updates = [str(statement) for statement, _ in db.calls if getattr(statement, "is_update", False)]
+        self.assertEqual(len(updates), 1)
+        self.assertIn("odds_ingested_at", updates[0])
+        self.assertNotIn("predictions_ingested_at", updates[0])
+
+
+class FinalResponseTtlTests(unittest.IsolatedAsyncioTestCase):
+    async def test_only_finished_fixtures_with_data_are_cached_long(self):
+        cache = TTLCache()
+        bodies = {'lineups': [{'team': {'id': 1}}], 'events': [], 'odds': UNCHANGED}
+        for key, body in bodies.items():
+            await cached_get(cache, (key, 10), final_response_ttl, mock.AsyncMock(return_value=body))
+
+        def lifetime(key):
+            return cache.get((key, 10)).expires_at - time.monotonic()
+
+        self.assertAlmostEqual(lifetime('lineups'), FINAL_RESPONSE_TTL, delta=5)
+        self.assertAlmostEqual(lifetime('events'), LIVE_RESPONSE_TTL, delta=5)
+        self.assertAlmostEqual(lifetime('odds'), LIVE_RESPONSE_TTL, delta=5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+# tests/test_ingest_odds.py
+
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from fastapi import HTTPException
+
+from tests.fakes import FakeSession
+from app.cache import fixtures_response_cache
+from app.routers.ingestion import ingest_odds
+
+
+class UpcomingFixturesSession(FakeSession):
+    async def execute(self, statement, params=None):
+        await super().execute(statement, params)
+        return SimpleNamespace(all=lambda: [(fixture_id, None) for fixture_id in range(100)])
+
+
+async def fill_queue_forever(fixture_id, last_update_time, semaphore, client, fetched):
+    while True:
+        await fetched.put((fixture_id, []))
+
+
+async def fail_on_first_item(fetched, db, known_ids):
+    await fetched.get()
+    raise RuntimeError("connection lost")
+
+
+async def no_reference_ids(db):
+    return {'bookmakers': set(), 'bet_types': set()}
+
+
+class FetchAndStoreOddsTests(unittest.IsolatedAsyncioTestCase):
+    async def test_consumer_failure_ends_the_request_instead_of_hanging(self):
+        db = UpcomingFixturesSession()
+        fixtures_response_cache.set('fixtures', [], ttl=None)
+        with mock.patch.object(ingest_odds, "API_FOOTBALL_KEY", "test-key"), \
+                mock.patch.object(ingest_odds, "fetch_odds_into_queue", fill_queue_forever), \
+                mock.patch.object(ingest_odds, "store_odds_worker", fail_on_first_item), \
+                mock.patch.object(ingest_odds, "load_odds_reference_ids", no_reference_ids):
+            with self.assertRaises(HTTPException) as raised:
+                await asyncio.wait_for(ingest_odds.fetch_and_store_odds(db=db, client=None), timeout=5)
+
+        self.assertEqual(raised.exception.detail, "connection lost")
+        self.assertIsNone(fixtures_response_cache.get('fixtures'))
+
+
+if __name__ == "__main__":
+    unittest.main()